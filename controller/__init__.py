@@ -1,8 +1,9 @@
+from controller.export_controller import export_controller
 from controller.hash_controller import hash_controller
 from controller.key_controller import key_controller
 from controller.main_controller import main_controller
 
 
 
-blueprints = [key_controller, main_controller, hash_controller]
+blueprints = [key_controller, main_controller, hash_controller, export_controller]
 
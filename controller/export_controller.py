@@ -0,0 +1,38 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from core.export_manager import ExportManager, parse_time
+
+export_controller = Blueprint('export', __name__, template_folder='../templates')
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+@export_controller.route('/api/export/performances', methods=['GET'])
+def api_export_performances():
+    """Exporte l'historique des performances en flux (CSV ou Parquet)"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'success': False, 'error': f"Format non supporté: {export_format}"}), 400
+
+    try:
+        chunks = ExportManager().stream(
+            export_format,
+            operation_type=request.args.get('operation_type'),
+            algorithm=request.args.get('algorithm'),
+            key_label=request.args.get('key_label'),
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 501
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename=performances.{export_format}'}
+    )
@@ -3,15 +3,19 @@
 
 from flask import request, jsonify
 from flask import Blueprint, render_template
+from core.admission_controller import AdmissionController
+from core.hash_backends import HashBackendRegistry
 from core.hash_manager import HashManager
 
 hash_controller = Blueprint('hash', __name__, template_folder='../templates')
 hash_manager = HashManager()
+admission = AdmissionController()
 
 
 
 
 @hash_controller.route('/hash', methods=['POST'])
+@admission.guard('interactive')
 def hash_message():
     method_hash = request.form.get('methodHash')
     data = request.form.get('hashInput')
@@ -21,3 +25,39 @@ def hash_message():
 
     return render_template("operations_results_hash.html", data_hashed=data_hashed)
 
+
+@hash_controller.route('/demonstrate/collision-resistance', methods=['POST'])
+@admission.guard('interactive')
+def demonstrate_collision_resistance():
+    """Démonstrations de la page de hachage (dont une collision sur 24 bits)"""
+    try:
+        return jsonify({'success': True, 'demonstrations': hash_manager.demonstrate_collision_resistance()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@hash_controller.route('/api/hash/collision-search', methods=['POST'])
+@admission.guard('bulk')
+def api_collision_search():
+    """
+    Recherche de collision sur un condensat tronqué
+
+    JSON : {"algorithm": "sha256", "bits": 32, "workers": null, "max_seconds": 30}
+    """
+    params = request.get_json(silent=True) or request.form
+    try:
+        report = hash_manager.search_collision(
+            algorithm=params.get('algorithm', 'sha256'),
+            bits=int(params.get('bits', 32)),
+            workers=int(params['workers']) if params.get('workers') else None,
+            max_seconds=min(float(params.get('max_seconds', 30)), 120),
+        )
+        return jsonify({'success': True, 'search': report})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@hash_controller.route('/api/hash/backends', methods=['GET'])
+def api_hash_backends():
+    """Implémentations de hachage disponibles et sélection par taille d'entrée"""
+    return jsonify({'success': True, 'backends': HashBackendRegistry().describe()})
@@ -1,23 +1,32 @@
+import json
+
 from flask import request, jsonify
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, render_template, stream_with_context
+from core.admission_controller import AdmissionController
 from core.hsm_manager import HSMManager
+from core.key_pool_manager import KeyPoolManager
 
 key_controller = Blueprint('keys', __name__, template_folder='../templates')
 hsm_manager = HSMManager()
+key_pool = KeyPoolManager()
+admission = AdmissionController()
 
 
 @key_controller.route('/generate-keys', methods=['POST'])
+@admission.guard('interactive')
 def api_generate_key():
     """Génère une nouvelle clé avec stockage"""
     try:
         key_size = int(request.form.get('key_size', 2048))
         key_type = request.form.get('keyType', 2048)
         key_label = request.form.get('keyLabel')
+        curve = request.form.get('curve') or None
 
-        result = hsm_manager.generate_key_pair_with_storage(
+        result = key_pool.generate_key_pair_with_storage(
             key_size=key_size,
             key_type=key_type,
-            key_label=key_label
+            key_label=key_label,
+            curve=curve
         )
         return render_template("operations_results_creating.html", result=result)
     except Exception as e:
@@ -26,33 +35,97 @@ def api_generate_key():
 
 
 
+@key_controller.route('/api/keys/pool', methods=['GET'])
+def api_key_pool():
+    """Niveaux et métriques du pool de clés pré-générées"""
+    try:
+        return jsonify({'success': True, 'pool': key_pool.get_statistics()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
 @key_controller.route('/api/keys/list', methods=['GET'])
+@admission.guard('interactive')
 def api_list_keys():
-    """Récupère la liste des clés"""
+    """Récupère la liste des clés, avec leur statut et leur utilisation"""
     try:
-        keys = hsm_manager.get_all_keys_public()
-        #statistics = database.get_usage_statistics()
+        keys = [
+            dict(hsm_manager.key_usage.usage(key['label']), label=key['label'], key_id=key['label'],
+                 key_type=key['key_type'])
+            for key in hsm_manager.get_all_keys_public()
+        ]
         return jsonify({
             'success': True,
             'keys': keys,
-            #'statistics': statistics
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
+@key_controller.route('/api/keys/statistics', methods=['GET'])
+def api_keys_statistics():
+    """Statistiques globales d'utilisation des clés"""
+    try:
+        labels = [key['label'] for key in hsm_manager.get_all_keys_public()]
+        statistics = hsm_manager.key_usage.summary()
+        statistics.update(
+            total_keys=len(labels),
+            active_keys=sum(hsm_manager.key_usage.is_active(label) for label in labels),
+        )
+        return jsonify({'success': True, 'statistics': statistics})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@key_controller.route('/api/keys/usage', methods=['GET'])
+def api_keys_usage():
+    """Clés les plus utilisées (?limit=10)"""
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        return jsonify({'success': True, 'keys': hsm_manager.key_usage.hot_keys(limit)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@key_controller.route('/api/keys/<key_id>/operations', methods=['GET'])
+def api_key_operations(key_id):
+    """Dernières opérations réalisées avec une clé"""
+    try:
+        limit = request.args.get('limit', type=int)
+        return jsonify({
+            'success': True,
+            'key_id': key_id,
+            'usage': hsm_manager.key_usage.usage(key_id),
+            'operations': hsm_manager.key_usage.operations(key_id, limit),
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@key_controller.route('/api/keys/<key_id>/toggle-status', methods=['POST'])
+def api_toggle_key_status(key_id):
+    """Active ou désactive une clé (une clé inactive est refusée par HSMManager)"""
+    try:
+        new_status = hsm_manager.key_usage.toggle_status(key_id)
+        return jsonify({'success': True, 'key_id': key_id, 'new_status': new_status})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
 @key_controller.route('/encrypt-decrypt', methods=['POST'])
+@admission.guard('interactive')
 def api_encrypt_data():
     mode = request.form.get('mode')
     label_private = request.form.get('keyPrivateSelector')
     label_public = request.form.get('keyPublicSelector')
+    aes_mode = request.form.get('aesMode', 'GCM')
 
     data = request.form.get('simpleInput')
     if mode not in ['encrypt', 'decrypt']:
         return jsonify({'success': False})
 
     if mode == 'encrypt':
-        data_encrypted =hsm_manager.encrypt_data(data, label_key=label_public)
+        data_encrypted =hsm_manager.encrypt_data(data, label_key=label_public, aes_mode=aes_mode)
         return  render_template('operations_results.html',data_encrypted=data_encrypted)
 
     elif mode == 'decrypt':
@@ -61,6 +134,7 @@ def api_encrypt_data():
 
 
 @key_controller.route('/sign-verify', methods=['POST'])
+@admission.guard('interactive')
 def api_sign_data():
     mode = request.form.get('mode')
     label_private = request.form.get('keyPrivateSelector')
@@ -85,6 +159,7 @@ def api_sign_data():
 
 
 @key_controller.route('/hash-sign', methods=['POST'])
+@admission.guard('interactive')
 def hash_sign_message():
     method_hash = request.form.get('hashAlgorithm')
     key_private = request.form.get('keyPrivateSelector')
@@ -98,6 +173,7 @@ def hash_sign_message():
 
 
 @key_controller.route('/verify-hash-signature', methods=['POST'])
+@admission.guard('interactive')
 def verify_hash_signature():
     method_hash = request.form.get('hashAlgorithm')
     key_public = request.form.get('keyPublicSelector')
@@ -112,3 +188,31 @@ def verify_hash_signature():
 
     return render_template("operations_results_hash_signature.html", is_valid=is_valid)
 
+
+def _batch_items():
+    """Éléments du lot : JSON {"items": [...]} ou NDJSON (un élément par ligne, lu en flux)"""
+    if request.mimetype == 'application/x-ndjson':
+        return (json.loads(line) for line in request.stream if line.strip())
+    return (request.get_json(silent=True) or {}).get('items', [])
+
+
+@key_controller.route('/api/verify/batch', methods=['POST'])
+@admission.guard('bulk')
+def api_verify_batch():
+    """
+    Vérifie un lot de signatures et renvoie les résultats en NDJSON, au fil de l'eau
+
+    Chaque élément : {"data" | "digest", "signature", "key_label", "hash_algorithm"}
+    """
+    workers = request.args.get('workers', type=int)
+
+    def generate():
+        total = 0
+        valid = 0
+        for result in hsm_manager.verify_many(_batch_items(), workers=workers):
+            total += 1
+            valid += result['valid']
+            yield json.dumps(result) + '\n'
+        yield json.dumps({'summary': {'total': total, 'valid': valid, 'invalid': total - valid}}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -1,8 +1,12 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify
+from core.admission_controller import AdmissionController
 from core.analysis_manager import AnalysisManager
+from core.hash_backends import HashBackendRegistry
 from core.hsm_manager import HSMManager
+from core.metrics_manager import MetricsManager
 
 hsm_manager = HSMManager()
+admission = AdmissionController()
 # Le nom 'pages' doit être utilisé dans url_for côté templates
 main_controller = Blueprint(
     'pages',
@@ -17,12 +21,14 @@ def index():
 
 
 @main_controller.route('/operations_creation')
+@admission.guard('interactive')
 def operations():
     """Page des opérations cryptographiques (signature, chiffrement, hash, etc.)"""
     keys = hsm_manager.get_all_keys_public()
     return render_template('operations_creation.html', keys=keys)
 
 @main_controller.route('/operations_listing')
+@admission.guard('interactive')
 def operations_listing():
     """Page des opérations cryptographiques (signature, chiffrement, hash, etc.)"""
     public_keys = hsm_manager.get_all_keys_public()
@@ -31,17 +37,21 @@ def operations_listing():
 
 
 @main_controller.route('/operations_chiffrement')
+@admission.guard('interactive')
 def operations_chiffrement():
     """Page des opérations cryptographiques (signature, chiffrement, hash, etc.)"""
     keys_publics = hsm_manager.get_all_keys_public()
     keys_privates = hsm_manager.get_all_keys_private()
+    keys_secrets = hsm_manager.get_all_keys_secret()
 
     return render_template('operations_chiffrement.html',
-                           keys_publics=keys_publics, keys_privates=keys_privates)
+                           keys_publics=keys_publics, keys_privates=keys_privates,
+                           keys_secrets=keys_secrets)
 
 
 
 @main_controller.route('/operations_signature')
+@admission.guard('interactive')
 def operations_signature():
     """Page des opérations cryptographiques (signature, chiffrement, hash, etc.)"""
     keys_privates = hsm_manager.get_all_keys_private()
@@ -51,21 +61,30 @@ def operations_signature():
 
 
 @main_controller.route('/operations_hashage')
+@admission.guard('interactive')
 def operations_hashage():
     """Page des opérations cryptographiques (signature, chiffrement, hash, etc.)"""
     keys = hsm_manager.get_all_keys_public()
-    return render_template('operations_hashage.html', keys=keys)
+    hash_algorithms = HashBackendRegistry().algorithms()
+    return render_template('operations_hashage.html', keys=keys, hash_algorithms=hash_algorithms)
 
 @main_controller.route('/operations_signature_hashage')
+@admission.guard('interactive')
 def operations_signature_hashage():
     """Page des opérations cryptographiques (signature, chiffrement, hash, etc.)"""
     keys_privates = hsm_manager.get_all_keys_private()
     keys_publics = hsm_manager.get_all_keys_public()
     return render_template('operations_signature_hashage.html',keys_privates=keys_privates, keys_publics=keys_publics)
 
+# Fenêtres proposées sur la page d'analyse (secondes -> libellé)
+RECENT_WINDOWS = {300: "5 min", 3600: "1 h", 86400: "24 h"}
+
+
 @main_controller.route("/operations_analysis")
+@admission.guard('interactive')
 def operations_analysis():
     manager = AnalysisManager()
+    window = request.args.get("window", 300, type=int)
 
     # Moyennes globales encrypt / decrypt (en secondes)
     avg_encrypt = manager.compute_average_encrypt_algorithm_operation()
@@ -84,6 +103,12 @@ def operations_analysis():
     hash_labels = list(hash_stats.keys())
     hash_values = [v * 1000 for v in hash_stats.values()]  # conversion en ms pour l'histogramme
 
+    # Activité récente (agrégats temporels)
+    recent_stats = manager.compute_recent_stats(window)
+
+    # Percentiles sur tout l'historique (bruts + compactés)
+    percentiles = manager.compute_percentiles()
+
     return render_template(
         "operations_analysis.html",
         # Encrypt / decrypt
@@ -98,8 +123,55 @@ def operations_analysis():
         hash_labels=hash_labels,
         hash_values=hash_values,
         avg_hash=avg_hash,
+
+        # Fenêtre récente
+        window=window,
+        windows=RECENT_WINDOWS,
+        recent_stats=recent_stats,
+        percentiles=percentiles,
+
+        # Effet avalanche (calculé à la demande via /api/analysis/avalanche)
+        hash_algorithms=HashBackendRegistry().algorithms(),
     )
 
+
+@main_controller.route("/api/analysis/recent")
+def api_recent_analysis():
+    """Agrégats et série temporelle sur une fenêtre récente (?window=secondes)"""
+    window = request.args.get("window", 300, type=int)
+    operation_type = request.args.get("operation_type")
+    # Lecture directe des agrégats temporels : pas de chargement (ni de fusion
+    # des fragments) de data.json à chaque rafraîchissement
+    metrics = MetricsManager()
+    return jsonify({
+        'success': True,
+        'window': window,
+        'stats': metrics.window_stats(window),
+        'timeline': metrics.timeline(window, operation_type),
+    })
+
+@main_controller.route("/api/analysis/avalanche")
+@admission.guard('bulk')
+def api_avalanche_analysis():
+    """
+    Effet avalanche par algorithme (?algorithms=sha256,md5&samples=10000&input_size=32)
+
+    Histogrammes des distances de Hamming et probabilité d'inversion par bit de sortie.
+    """
+    algorithms = [a for a in request.args.get("algorithms", "").split(",") if a] or None
+    samples = min(request.args.get("samples", 10000, type=int), 1_000_000)
+    input_size = min(request.args.get("input_size", 32, type=int), 4096)
+    try:
+        results = hsm_manager.hash_manager.analyze_avalanche(algorithms, samples, input_size)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'results': results})
+
+@main_controller.route("/api/admission/stats")
+def api_admission_stats():
+    """Latences (attente, service) et refus par classe de priorité"""
+    return jsonify({'success': True, 'admission': admission.get_statistics()})
+
 @main_controller.route('/keys')
 def keys_management():
     """Page de gestion des clés"""
@@ -0,0 +1,313 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from flask import jsonify, make_response, request
+
+from core.latency_sketch import LatencySketch
+from utils.singleton_metaclass import SingletonMeta
+
+# Classes de priorité, de la plus prioritaire à la moins prioritaire
+PRIORITIES = ('interactive', 'bulk')
+
+DEFAULTS = {
+    # débit (req/s), rafale, profondeur de file, attente maximale (s)
+    'interactive': {'rate': 20.0, 'burst': 40, 'queue': 64, 'deadline': 2.0},
+    'bulk': {'rate': 5.0, 'burst': 10, 'queue': 16, 'deadline': 30.0},
+}
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée : quota dépassé, file pleine ou échéance dépassée"""
+
+    def __init__(self, reason, retry_after=1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Consomme un jeton ; sinon renvoie le délai avant le prochain jeton"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self, now):
+        """Seau de nouveau plein : le supprimer équivaut à en recréer un"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class Ticket:
+    """Place accordée (ou en attente) pour une opération sur le HSM"""
+
+    def __init__(self, controller, priority, deadline):
+        self.controller = controller
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+        self.granted = threading.Event()
+        self.shed = False
+        self.released = False
+
+    def release(self):
+        self.controller.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class ClassStats:
+    def __init__(self):
+        self.admitted = 0
+        self.rejected_quota = 0
+        self.rejected_queue_full = 0
+        self.shed_deadline = 0
+        self.queue_wait = LatencySketch()
+        self.service_time = LatencySketch()
+
+    def to_dict(self):
+        return {
+            'admitted': self.admitted,
+            'rejected_quota': self.rejected_quota,
+            'rejected_queue_full': self.rejected_queue_full,
+            'shed_deadline': self.shed_deadline,
+            'queue_wait_ms': self._percentiles(self.queue_wait),
+            'service_time_ms': self._percentiles(self.service_time),
+        }
+
+    def _percentiles(self, sketch):
+        if sketch.count == 0:
+            return None
+        return {
+            'mean': sketch.mean * 1000,
+            'p50': sketch.quantile(0.5) * 1000,
+            'p99': sketch.quantile(0.99) * 1000,
+        }
+
+
+class AdmissionController(metaclass=SingletonMeta):
+    """
+    Contrôle d'admission devant les opérations du HSM
+
+    - quota par client (seau à jetons) et par classe de priorité
+    - `admission_concurrency` opérations simultanées au plus ; au-delà, les
+      requêtes attendent dans une file par classe (interactive avant bulk)
+    - les requêtes bulk n'occupent jamais plus de `admission_concurrency_bulk`
+      places : le reste est réservé aux requêtes interactives, même quand des
+      opérations bulk longues (flux, recherche de collision) sont en cours
+    - file pleine ou attente dépassant l'échéance de la classe : requête refusée
+
+    Le client est identifié par son adresse IP. L'en-tête X-Client-Id n'est
+    pris en compte que s'il est posé par un proxy de confiance
+    (`admission_trusted_proxies`) : sinon un client pourrait changer
+    d'identifiant à chaque requête pour contourner son quota. Les seaux
+    redevenus pleins sont supprimés périodiquement.
+    En déploiement multi-processus, chaque worker applique ses propres limites.
+
+    Configuration (.env) :
+        admission_enabled                0 pour désactiver
+        admission_concurrency            opérations simultanées (défaut 4)
+        admission_concurrency_bulk       places utilisables par bulk (défaut : moitié)
+        admission_rate_<classe>          jetons par seconde et par client
+        admission_burst_<classe>         taille du seau
+        admission_queue_<classe>         profondeur maximale de la file
+        admission_deadline_<classe>      attente maximale en secondes
+        admission_trusted_proxies        adresses dont l'en-tête X-Client-Id est accepté
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("admission_enabled", "1") != "0"
+        self.concurrency = max(1, int(os.environ.get("admission_concurrency", 4)))
+        # Au moins une place reste réservée aux requêtes interactives
+        default_bulk = max(1, self.concurrency // 2)
+        self.class_limits = {
+            'interactive': self.concurrency,
+            'bulk': min(max(1, int(os.environ.get("admission_concurrency_bulk", default_bulk))),
+                        max(1, self.concurrency - 1)),
+        }
+        self.settings = {
+            priority: {
+                name: type(default)(os.environ.get(f"admission_{name}_{priority}", default))
+                for name, default in DEFAULTS[priority].items()
+            }
+            for priority in PRIORITIES
+        }
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.in_flight_by_class = {priority: 0 for priority in PRIORITIES}
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        self.trusted_proxies = {address.strip() for address in
+                                os.environ.get("admission_trusted_proxies", "").split(',') if address.strip()}
+        self.buckets = {}  # (client, classe) -> TokenBucket
+        self._last_eviction = time.monotonic()
+        self.stats = {priority: ClassStats() for priority in PRIORITIES}
+
+    def _evict_idle_buckets(self, now, interval=60.0):
+        """Appelé sous verrou : borne la mémoire au nombre de clients actifs"""
+        if now - self._last_eviction < interval:
+            return
+        self._last_eviction = now
+        for key in [key for key, bucket in self.buckets.items() if bucket.idle(now)]:
+            del self.buckets[key]
+
+    def client_id(self, remote_addr, headers):
+        """Identité du client pour les quotas"""
+        if remote_addr in self.trusted_proxies and headers.get('X-Client-Id'):
+            return headers['X-Client-Id']
+        return remote_addr or 'anonymous'
+
+    def _bucket(self, client_id, priority):
+        self._evict_idle_buckets(time.monotonic())
+        key = (client_id, priority)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            settings = self.settings[priority]
+            bucket = self.buckets[key] = TokenBucket(settings['rate'], settings['burst'])
+        return bucket
+
+    def admit(self, priority, client_id):
+        """
+        Attend une place pour une opération de la classe `priority`
+
+        Returns:
+            Ticket: à libérer avec `release()` (ou utilisé comme context manager)
+
+        Raises:
+            AdmissionRejected: quota dépassé, file pleine ou échéance dépassée
+        """
+        settings = self.settings[priority]
+        stats = self.stats[priority]
+        with self.lock:
+            wait_time = self._bucket(client_id, priority).take()
+            if wait_time:
+                stats.rejected_quota += 1
+                raise AdmissionRejected("Quota dépassé", retry_after=wait_time)
+
+            ticket = Ticket(self, priority, time.monotonic() + settings['deadline'])
+            # Pas de dépassement : seules les files de priorité égale ou supérieure comptent
+            ahead = PRIORITIES[:PRIORITIES.index(priority) + 1]
+            if self._has_room(priority) and not any(self.queues[other] for other in ahead):
+                self._grant(ticket)
+                return ticket
+            if len(self.queues[priority]) >= settings['queue']:
+                stats.rejected_queue_full += 1
+                raise AdmissionRejected("File d'attente pleine", retry_after=settings['deadline'])
+            self.queues[priority].append(ticket)
+
+        if ticket.granted.wait(timeout=max(0.0, ticket.deadline - time.monotonic())):
+            return ticket
+        with self.lock:
+            if ticket.granted.is_set():  # accordé entre l'échéance et le verrou
+                return ticket
+            if not ticket.shed:
+                self.queues[priority].remove(ticket)
+                stats.shed_deadline += 1
+        raise AdmissionRejected("Échéance dépassée dans la file", retry_after=settings['deadline'])
+
+    def _has_room(self, priority):
+        """Appelé sous verrou"""
+        return (self.in_flight < self.concurrency
+                and self.in_flight_by_class[priority] < self.class_limits[priority])
+
+    def _grant(self, ticket):
+        """Appelé sous verrou"""
+        self.in_flight += 1
+        self.in_flight_by_class[ticket.priority] += 1
+        ticket.granted_at = time.monotonic()
+        stats = self.stats[ticket.priority]
+        stats.admitted += 1
+        stats.queue_wait.add(ticket.granted_at - ticket.enqueued_at)
+        ticket.granted.set()
+
+    def release(self, ticket):
+        with self.lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            self.in_flight -= 1
+            self.in_flight_by_class[ticket.priority] -= 1
+            self.stats[ticket.priority].service_time.add(time.monotonic() - ticket.granted_at)
+            self._dispatch()
+
+    def _dispatch(self):
+        """Donne les places libres aux files, par ordre de priorité (sous verrou)"""
+        now = time.monotonic()
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            while queue and self._has_room(priority):
+                ticket = queue.popleft()
+                if ticket.deadline <= now:
+                    # Le demandeur, réveillé par son échéance, lèvera AdmissionRejected
+                    ticket.shed = True
+                    self.stats[priority].shed_deadline += 1
+                    continue
+                self._grant(ticket)
+
+    def get_statistics(self):
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'concurrency': self.concurrency,
+                'in_flight': self.in_flight,
+                'clients': len({client for client, _ in self.buckets}),
+                'classes': {
+                    priority: dict(self.stats[priority].to_dict(),
+                                   in_flight=self.in_flight_by_class[priority],
+                                   concurrency=self.class_limits[priority],
+                                   queue_depth=len(self.queues[priority]),
+                                   limits=self.settings[priority])
+                    for priority in PRIORITIES
+                },
+            }
+
+    def guard(self, priority):
+        """
+        Décorateur de route Flask : admission avant la vue, réponse 429 en cas de refus
+
+        Pour une réponse en flux, la place est libérée à la fermeture de la réponse.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Classe de priorité inconnue: {priority}")
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                client_id = self.client_id(request.remote_addr, request.headers)
+                try:
+                    ticket = self.admit(priority, client_id)
+                except AdmissionRejected as e:
+                    response = jsonify({'success': False, 'error': e.reason, 'priority': priority})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+                    return response
+                try:
+                    response = make_response(view(*args, **kwargs))
+                except BaseException:
+                    ticket.release()
+                    raise
+                if response.is_streamed:
+                    response.call_on_close(ticket.release)
+                else:
+                    ticket.release()
+                return response
+            return wrapper
+        return decorator
@@ -1,12 +1,24 @@
 import json
 import os
 
+from core.latency_sketch import LatencySketch
+from core.metrics_manager import MetricsManager
+
 
 class AnalysisManager:
     def __init__(self):
+        metrics = MetricsManager()
+        if metrics.shard_dir:
+            # Mode multi-processus : intègre d'abord les fragments des workers
+            metrics.merge_shards()
         with open(os.environ["data_file"], "r") as f:
             self.file_data = json.load(f)
         self.performances = self.file_data["database"]["performances"]
+        # Historique compacté : entrées {operation_type, algorithm, size_bucket, sketch}
+        self.sketches = [
+            (entry, LatencySketch.from_dict(entry["sketch"]))
+            for entry in self.file_data["database"].get("sketches", [])
+        ]
 
     def _get_durations(self, filt):
         durations = []
@@ -15,42 +27,74 @@ class AnalysisManager:
                 durations.append(item["duration"])  # champ "duration" dans ton JSON
         return durations
 
+    def _average(self, filt):
+        """Moyenne sur les échantillons bruts et l'historique compacté"""
+        durations = self._get_durations(filt)
+        count = len(durations)
+        total = sum(durations)
+        for entry, sketch in self.sketches:
+            if filt(entry):
+                count += sketch.count
+                total += sketch.sum
+        return total / count if count else 0
+
+    def _average_by_algorithm(self, operation_type):
+        buckets = {}
+        for item in self.performances:
+            if item["operation_type"] == operation_type and "algorithm" in item:
+                totals = buckets.setdefault(item["algorithm"], [0, 0.0])
+                totals[0] += 1
+                totals[1] += item["duration"]
+        for entry, sketch in self.sketches:
+            if entry["operation_type"] == operation_type and "algorithm" in entry:
+                totals = buckets.setdefault(entry["algorithm"], [0, 0.0])
+                totals[0] += sketch.count
+                totals[1] += sketch.sum
+
+        return {
+            algo: total / count
+            for algo, (count, total) in buckets.items()
+            if count
+        }
+
     # ======== CHIFFREMENT / DÉCHIFFREMENT =========
 
     def compute_average_encrypt_algorithm_operation(self):
-        durations = self._get_durations(
+        return self._average(
             lambda item: item["operation_type"] == "encrypt_data"
         )
-        return sum(durations) / len(durations) if durations else 0
 
     def compute_average_decrypt_algorithm_operation(self):
-        durations = self._get_durations(
+        return self._average(
             lambda item: item["operation_type"] == "decrypt_data"
         )
-        return sum(durations) / len(durations) if durations else 0
 
     def compute_average_encryption_algorithm_operation(self, kind: str):
-        durations = self._get_durations(
+        return self._average(
             lambda item: item["operation_type"] == "encrypt_data"
                         and item.get("algorithm") == kind
         )
-        return sum(durations) / len(durations) if durations else 0
 
     def compute_average_by_algorithm(self):
         """
         Retourne un dict: { "RSA_PKCS": moyenne_duration, ... }
         pour les opérations encrypt_data avec un algorithm défini.
         """
-        buckets = {}
-        for item in self.performances:
-            if item["operation_type"] == "encrypt_data" and "algorithm" in item:
-                algo = item["algorithm"]
-                buckets.setdefault(algo, []).append(item["duration"])
+        return self._average_by_algorithm("encrypt_data")
 
-        return {
-            algo: sum(durs) / len(durs)
-            for algo, durs in buckets.items()
-        }
+    # ======== FENÊTRES RÉCENTES =========
+
+    def compute_recent_stats(self, window_seconds):
+        """
+        Statistiques des `window_seconds` dernières secondes, lues dans les
+        agrégats temporels (sans parcourir l'historique complet).
+        Retourne un dict: { "encrypt_data": { "RSA": {count, avg, min, max} }, ... }
+        """
+        return MetricsManager().window_stats(window_seconds)
+
+    def compute_recent_timeline(self, window_seconds, operation_type=None):
+        """Série (début de case, nombre, durée moyenne) sur la fenêtre demandée"""
+        return MetricsManager().timeline(window_seconds, operation_type)
 
     # ======== HASHAGE =========
 
@@ -58,23 +102,37 @@ class AnalysisManager:
         """
         Durée moyenne de TOUTES les opérations de hash (tous algos confondus).
         """
-        durations = self._get_durations(
+        return self._average(
             lambda item: item["operation_type"] == "hash"
         )
-        return sum(durations) / len(durations) if durations else 0
 
     def compute_average_hash_by_algorithm(self):
         """
         Retourne un dict: { "md5": moyenne_duration, "sha256": ..., ... }
         pour les opérations de hash.
         """
-        buckets = {}
+        return self._average_by_algorithm("hash")
+
+    # ======== PERCENTILES =========
+
+    def compute_percentiles(self, quantiles=(0.5, 0.9, 0.99)):
+        """
+        Percentiles de durée par opération et algorithme sur tout l'historique
+        (échantillons bruts + sketches compactés, toutes classes de taille).
+        Retourne un dict: { "hash": { "md5": {"count": n, "p50": ..., ...} }, ... }
+        """
+        groups = {}
         for item in self.performances:
-            if item["operation_type"] == "hash" and "algorithm" in item:
-                algo = item["algorithm"]
-                buckets.setdefault(algo, []).append(item["duration"])
+            key = (item["operation_type"], str(item.get("algorithm", "N/A")))
+            groups.setdefault(key, LatencySketch()).add(item["duration"])
+        for entry, sketch in self.sketches:
+            key = (entry["operation_type"], str(entry.get("algorithm", "N/A")))
+            groups.setdefault(key, LatencySketch()).merge(sketch)
 
-        return {
-            algo: sum(durs) / len(durs)
-            for algo, durs in buckets.items()
-        }
+        result = {}
+        for (operation_type, algorithm), sketch in sorted(groups.items()):
+            stats = {'count': sketch.count, 'avg': sketch.mean}
+            for q in quantiles:
+                stats[f"p{q * 100:g}"] = sketch.quantile(q)
+            result.setdefault(operation_type, {})[algorithm] = stats
+        return result
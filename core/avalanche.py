@@ -0,0 +1,98 @@
+"""
+Statistiques de l'effet avalanche sur de grands échantillons
+
+Pour chaque entrée aléatoire, on inverse un bit choisi au hasard et on compare
+les deux condensats. Une bonne fonction de hachage inverse chaque bit de
+sortie avec une probabilité 1/2 : la distance de Hamming suit alors une loi
+binomiale B(n, 1/2), n étant la taille du condensat en bits.
+
+Seul le hachage est fait message par message ; le tirage des entrées,
+l'inversion des bits, le XOR des condensats et le comptage des bits sont
+vectorisés avec numpy, par lots pour borner la mémoire.
+"""
+import math
+import time
+
+import numpy as np
+
+from core.hash_backends import HashBackendRegistry
+
+
+def _digests(digest, inputs):
+    """Condensats des lignes de `inputs` -> tableau (n, taille du condensat) d'octets"""
+    raw = inputs.tobytes()
+    size = inputs.shape[1]
+    joined = b''.join([digest(raw[i:i + size]) for i in range(0, len(raw), size)])
+    return np.frombuffer(joined, dtype=np.uint8).reshape(len(inputs), -1)
+
+
+def binomial_histogram(digest_bits, samples):
+    """Histogramme attendu de la distance de Hamming pour une fonction idéale"""
+    log_half = digest_bits * math.log(0.5)
+    return [samples * math.exp(math.lgamma(digest_bits + 1) - math.lgamma(k + 1)
+                               - math.lgamma(digest_bits - k + 1) + log_half)
+            for k in range(digest_bits + 1)]
+
+
+def avalanche_statistics(algorithm, samples=10000, input_size=32, batch_size=8192, seed=None):
+    """
+    Effet avalanche d'un algorithme sur `samples` paires (entrée, entrée avec un bit inversé)
+
+    Returns:
+        dict: probabilité d'inversion par bit de sortie, histogramme des distances
+        de Hamming (observé et attendu), moyenne, écart-type, biais maximal
+    """
+    samples = int(samples)
+    input_size = int(input_size)
+    if samples < 1 or input_size < 1:
+        raise ValueError("samples et input_size doivent être positifs")
+    digest = HashBackendRegistry().digest_function(algorithm, input_size)
+    rng = np.random.default_rng(seed)
+
+    start_time = time.perf_counter()
+    flip_counts = None
+    hamming_counts = None
+    hamming_sum = 0
+    hamming_square_sum = 0
+    done = 0
+    while done < samples:
+        count = min(batch_size, samples - done)
+        inputs = rng.integers(0, 256, (count, input_size), dtype=np.uint8)
+        positions = rng.integers(0, input_size * 8, count)
+        flipped = inputs.copy()
+        flipped[np.arange(count), positions // 8] ^= (1 << (positions % 8)).astype(np.uint8)
+
+        changed = np.unpackbits(_digests(digest, inputs) ^ _digests(digest, flipped), axis=1)
+        distances = changed.sum(axis=1, dtype=np.int64)
+        if flip_counts is None:
+            flip_counts = np.zeros(changed.shape[1], dtype=np.int64)
+            hamming_counts = np.zeros(changed.shape[1] + 1, dtype=np.int64)
+        flip_counts += changed.sum(axis=0, dtype=np.int64)
+        hamming_counts += np.bincount(distances, minlength=len(hamming_counts))
+        hamming_sum += int(distances.sum())
+        hamming_square_sum += int((distances * distances).sum())
+        done += count
+
+    digest_bits = len(flip_counts)
+    flip_probability = flip_counts / samples
+    mean = hamming_sum / samples
+    return {
+        'algorithm': algorithm,
+        'samples': samples,
+        'input_size': input_size,
+        'digest_bits': digest_bits,
+        'elapsed_s': time.perf_counter() - start_time,
+        'hamming_mean': mean,
+        'hamming_std': math.sqrt(max(0.0, hamming_square_sum / samples - mean * mean)),
+        'hamming_expected_mean': digest_bits / 2,
+        'hamming_expected_std': math.sqrt(digest_bits) / 2,
+        'hamming_histogram': hamming_counts.tolist(),
+        'hamming_binomial': binomial_histogram(digest_bits, samples),
+        'flip_probability': flip_probability.round(5).tolist(),
+        'flip_probability_min': float(flip_probability.min()),
+        'flip_probability_max': float(flip_probability.max()),
+        # Écart maximal à 1/2 ; pour une fonction idéale, chaque probabilité a un
+        # écart-type de 0.5 / sqrt(samples) (le maximum sur n bits vaut ~3 à 4 fois plus)
+        'max_bias': float(np.abs(flip_probability - 0.5).max()),
+        'bias_std': 0.5 / math.sqrt(samples),
+    }
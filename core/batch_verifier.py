@@ -0,0 +1,108 @@
+"""
+Vérification de signatures hors token, exécutée dans les processus de travail
+
+Les clés publiques ne sont pas secrètes : elles sont exportées une fois du HSM
+(voir HSMManager.verify_many) puis les signatures sont vérifiées avec
+`cryptography`, en parallèle sur plusieurs cœurs. Les conventions reproduisent
+celles de HSMManager.sign_data :
+    RSA    CKM_RSA_PKCS, PKCS#1 v1.5 sans DigestInfo sur le message brut
+    ECDSA  CKM_ECDSA sur le condensat du message (sha256/384/512 selon la courbe)
+    EdDSA  CKM_EDDSA sur le message brut
+"""
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, ed448, padding, rsa, utils
+
+from core.hash_backends import HashBackendRegistry
+
+_PREHASH = {
+    'sha256': hashes.SHA256,
+    'sha384': hashes.SHA384,
+    'sha512': hashes.SHA512,
+}
+
+# Cache des clés chargées dans chaque processus de travail
+_KEY_CACHE = {}
+
+
+def message_for(item):
+    """
+    Octets effectivement signés pour un élément du lot
+
+    - `digest` fourni : le condensat hexadécimal a été signé (hash_and_sign)
+    - `hash_algorithm` fourni : on recalcule ce condensat à partir de `data`
+    - sinon : `data` a été signé tel quel (sign_data)
+    """
+    if item.get('digest'):
+        return item['digest'].strip().encode('utf-8')
+    data = item.get('data') or ''
+    if item.get('hash_algorithm'):
+        registry = HashBackendRegistry()
+        if not registry.is_secure(item['hash_algorithm']):
+            raise ValueError(f"Algorithme non utilisable pour une signature: {item['hash_algorithm']}")
+        data_bytes = data.encode('utf-8')
+        hash_object = registry.new(item['hash_algorithm'], len(data_bytes))
+        hash_object.update(data_bytes)
+        return hash_object.hexdigest().encode('utf-8')
+    return data.strip().encode('utf-8')
+
+
+def _load_key(key_spec):
+    cache_key = (key_spec['type'], key_spec.get('n') or key_spec.get('der') or key_spec.get('raw'))
+    key = _KEY_CACHE.get(cache_key)
+    if key is None:
+        if key_spec['type'] == 'RSA':
+            key = rsa.RSAPublicNumbers(key_spec['e'], key_spec['n']).public_key()
+        elif key_spec['type'] == 'EC':
+            key = serialization.load_der_public_key(key_spec['der'])
+        elif key_spec['type'] == 'ED25519':
+            key = ed25519.Ed25519PublicKey.from_public_bytes(key_spec['raw'])
+        elif key_spec['type'] == 'ED448':
+            key = ed448.Ed448PublicKey.from_public_bytes(key_spec['raw'])
+        else:
+            raise ValueError(f"Type de clé non supporté: {key_spec['type']}")
+        _KEY_CACHE[cache_key] = key
+    return key
+
+
+def verify_one(key_spec, message, signature):
+    """True si `signature` (bytes) est valide pour `message` (bytes)"""
+    public_key = _load_key(key_spec)
+    try:
+        if key_spec['type'] == 'RSA':
+            recovered = public_key.recover_data_from_signature(signature, padding.PKCS1v15(), None)
+            return recovered == message
+        if key_spec['type'] == 'EC':
+            half = len(signature) // 2
+            der_signature = utils.encode_dss_signature(int.from_bytes(signature[:half], 'big'),
+                                                       int.from_bytes(signature[half:], 'big'))
+            prehash = _PREHASH[key_spec['digest']]()
+            digest = hashes.Hash(prehash)
+            digest.update(message)
+            public_key.verify(der_signature, digest.finalize(), ec.ECDSA(utils.Prehashed(prehash)))
+            return True
+        public_key.verify(signature, message)
+        return True
+    except (InvalidSignature, ValueError):
+        return False
+
+
+def verify_chunk(key_spec, items):
+    """
+    Vérifie un lot d'éléments signés avec la même clé
+
+    Args:
+        items (list): [(index, élément), ...]
+
+    Returns:
+        list: [{'index': i, 'valid': bool, 'error'?: str}, ...]
+    """
+    results = []
+    for index, item in items:
+        try:
+            signature = bytes.fromhex(item['signature'])
+            valid = verify_one(key_spec, message_for(item), signature)
+            results.append({'index': index, 'valid': valid})
+        except Exception as e:
+            results.append({'index': index, 'valid': False, 'error': str(e)})
+    return results
@@ -0,0 +1,331 @@
+"""
+Recherche de collisions (paradoxe des anniversaires) sur des condensats tronqués
+
+On ne garde que les `bits` premiers bits du condensat : une collision est
+attendue après environ sqrt(pi/2 * 2^bits) essais. La démonstration montre
+pourquoi la longueur du condensat compte : chaque bit ajouté multiplie le
+coût par sqrt(2).
+
+Deux méthodes :
+    table          (bits <= 40) messages seed||compteur générés par lots avec
+                   numpy, valeurs tronquées gardées dans un tableau trié
+                   (16 octets par entrée)
+    distinguished  (bits > 40) points distingués de van Oorschot-Wiener :
+                   chaque chemin x -> H(seed||x) s'arrête sur une valeur dont
+                   les bits de poids faible sont nuls ; seuls ces points sont
+                   conservés, la mémoire reste négligeable
+
+Le calcul des condensats est réparti sur le pool de processus partagé
+(voir core.process_pool).
+"""
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+from core.hash_backends import HashBackendRegistry
+from core.process_pool import ProcessPool
+
+# Au-delà, la recherche par table dépasse la mémoire d'un portable
+TABLE_MAX_BITS = 40
+MIN_BITS = 8
+MAX_BITS = 64
+
+# Fonctions de hachage par processus (le registre est calibré une fois)
+_DIGEST_FUNCTIONS = {}
+
+
+def _digest_function(algorithm):
+    """Fonction message -> condensat complet, avec l'implémentation la plus rapide"""
+    function = _DIGEST_FUNCTIONS.get(algorithm)
+    if function is None:
+        function = _DIGEST_FUNCTIONS[algorithm] = HashBackendRegistry().digest_function(algorithm, 16)
+    return function
+
+
+def _truncate(digests, digest_size, bits):
+    """Condensats concaténés -> tableau uint64 des `bits` premiers bits"""
+    byte_count = (bits + 7) // 8
+    rows = np.frombuffer(digests, dtype=np.uint8).reshape(-1, digest_size)[:, :byte_count].astype(np.uint64)
+    values = np.zeros(len(rows), dtype=np.uint64)
+    for i in range(byte_count):
+        values = (values << np.uint64(8)) | rows[:, i]
+    return values >> np.uint64(byte_count * 8 - bits)
+
+
+def _truncate_one(digest, bits):
+    byte_count = (bits + 7) // 8
+    return int.from_bytes(digest[:byte_count], 'big') >> (byte_count * 8 - bits)
+
+
+def candidate_messages(seed, start, count):
+    """Lot de messages seed (8 octets) || compteur (8 octets, little-endian)"""
+    counters = np.arange(start, start + count, dtype=np.uint64)
+    buffer = np.empty((count, 16), dtype=np.uint8)
+    buffer[:, :8] = np.frombuffer(seed, dtype=np.uint8)
+    buffer[:, 8:] = counters.view(np.uint8).reshape(count, 8)
+    raw = buffer.tobytes()
+    return [raw[i:i + 16] for i in range(0, len(raw), 16)]
+
+
+def message_for_counter(seed, counter):
+    return seed + int(counter).to_bytes(8, 'little')
+
+
+def hash_batch(algorithm, bits, seed, start, count):
+    """Tâche d'un processus (méthode table) : valeurs tronquées d'un lot de messages"""
+    digest = _digest_function(algorithm)
+    digests = b''.join([digest(message) for message in candidate_messages(seed, start, count)])
+    return start, _truncate(digests, len(digests) // count, bits)
+
+
+def _step(digest, seed, bits, value):
+    """Fonction itérée des points distingués : x -> H(seed || x) tronqué"""
+    return _truncate_one(digest(seed + value.to_bytes(8, 'little')), bits)
+
+
+def walk_trails(algorithm, bits, seed, starts, dp_bits, max_length):
+    """
+    Tâche d'un processus (points distingués) : parcourt un chemin par point de départ
+
+    Returns:
+        tuple: ([(départ, point distingué, longueur), ...], condensats calculés)
+    """
+    digest = _digest_function(algorithm)
+    mask = (1 << dp_bits) - 1
+    trails = []
+    hashes = 0
+    for start in starts:
+        value = start
+        for length in range(1, max_length + 1):
+            value = _step(digest, seed, bits, value)
+            if value & mask == 0:
+                trails.append((start, value, length))
+                break
+        hashes += length
+    return trails, hashes
+
+
+class CollisionSearch:
+    """
+    Attaque des anniversaires sur les `bits` premiers bits d'un condensat
+
+    Args:
+        algorithm (str): Algorithme du registre de hachage (sha256, md5, blake2b...)
+        bits (int): Longueur du condensat tronqué (ex: 24 à 48)
+        workers (int): Lots en parallèle (défaut : collision_workers ; borné par la taille du pool)
+        batch_size (int): Messages par lot envoyé à un processus
+        max_seconds (float): Durée maximale de la recherche
+    """
+
+    def __init__(self, algorithm='sha256', bits=32, workers=None, batch_size=1 << 16, max_seconds=60):
+        registry = HashBackendRegistry()
+        if algorithm not in registry.algorithms():
+            raise ValueError(f"Algorithme non supporté: {algorithm}")
+        digest_bits = len(registry.new(algorithm).digest()) * 8
+        bits = int(bits)
+        if not MIN_BITS <= bits <= min(MAX_BITS, digest_bits):
+            raise ValueError(f"Nombre de bits invalide: {bits} (entre {MIN_BITS} et {min(MAX_BITS, digest_bits)})")
+
+        self.algorithm = algorithm
+        self.bits = bits
+        self.digest_bits = digest_bits
+        pool = ProcessPool()
+        self.workers = pool.clamp(workers or int(os.environ.get("collision_workers", pool.max_workers)))
+        # Lots assez petits pour que le nombre d'essais reste proche de la borne
+        self.batch_size = min(int(batch_size), max(1024, int(self.birthday_bound) // (4 * self.workers)))
+        self.max_seconds = float(max_seconds)
+        self.method = 'table' if bits <= TABLE_MAX_BITS else 'distinguished'
+        self.seed = os.urandom(8)
+        self.candidates = 0
+
+    @property
+    def birthday_bound(self):
+        """Nombre moyen d'essais avant la première collision"""
+        return math.sqrt(math.pi / 2 * 2 ** self.bits)
+
+    def run(self):
+        """Lance la recherche et renvoie le rapport (voir `_report`)"""
+        start_time = time.perf_counter()
+        self.candidates = 0
+        executor = ProcessPool() if self.workers > 1 else None
+        if self.method == 'table':
+            collision = self._search_table(executor, start_time)
+        else:
+            collision = self._search_distinguished(executor, start_time)
+        return self._report(collision, time.perf_counter() - start_time)
+
+    def _run_tasks(self, executor, tasks, handle, start_time):
+        """
+        Exécute les tâches (générateur de (fonction, args)) en gardant un nombre
+        borné de tâches en vol ; `handle(résultat)` renvoie une collision ou None
+        """
+        in_flight = set()
+        try:
+            while True:
+                while len(in_flight) < 2 * self.workers:
+                    function, args = next(tasks)
+                    if executor is None:
+                        collision = handle(function(*args))
+                        if collision is not None:
+                            return collision
+                        if time.perf_counter() - start_time > self.max_seconds:
+                            return None
+                    else:
+                        in_flight.add(executor.submit(function, *args))
+                if not in_flight:
+                    continue
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collision = handle(future.result())
+                    if collision is not None:
+                        return collision
+                if time.perf_counter() - start_time > self.max_seconds:
+                    return None
+        finally:
+            # Le pool est partagé : on annule seulement nos lots pas encore démarrés
+            for future in in_flight:
+                future.cancel()
+
+    # ======== MÉTHODE TABLE =========
+
+    def _search_table(self, executor, start_time):
+        table_values = np.empty(0, dtype=np.uint64)
+        table_counters = np.empty(0, dtype=np.uint64)
+
+        def tasks():
+            start = 0
+            while True:
+                yield hash_batch, (self.algorithm, self.bits, self.seed, start, self.batch_size)
+                start += self.batch_size
+
+        def handle(result):
+            nonlocal table_values, table_counters
+            start, values = result
+            self.candidates += len(values)
+            counters = np.arange(start, start + len(values), dtype=np.uint64)
+
+            # Collision avec un lot précédent
+            if len(table_values):
+                positions = np.searchsorted(table_values, values)
+                positions[positions == len(table_values)] = 0
+                hits = np.nonzero(table_values[positions] == values)[0]
+                if len(hits):
+                    return int(table_counters[positions[hits[0]]]), int(counters[hits[0]])
+
+            # Collision à l'intérieur du lot, puis fusion dans la table triée
+            order = np.argsort(values, kind='stable')
+            sorted_values = values[order]
+            duplicates = np.nonzero(sorted_values[1:] == sorted_values[:-1])[0]
+            if len(duplicates):
+                return int(counters[order[duplicates[0]]]), int(counters[order[duplicates[0] + 1]])
+
+            merged_values = np.concatenate([table_values, sorted_values])
+            merged_order = np.argsort(merged_values, kind='stable')
+            table_values = merged_values[merged_order]
+            table_counters = np.concatenate([table_counters, counters[order]])[merged_order]
+            return None
+
+        found = self._run_tasks(executor, tasks(), handle, start_time)
+        if found is None:
+            return None
+        return message_for_counter(self.seed, found[0]), message_for_counter(self.seed, found[1])
+
+    # ======== MÉTHODE DES POINTS DISTINGUÉS =========
+
+    @property
+    def dp_bits(self):
+        # Chemins de 2^(bits/4) pas : ~2^(bits/4) points distingués à stocker
+        return max(4, self.bits // 4)
+
+    def _search_distinguished(self, executor, start_time):
+        dp_bits = self.dp_bits
+        max_length = 20 << dp_bits  # chemin abandonné (cycle probable)
+        trails_per_task = max(1, self.batch_size >> dp_bits)
+        rng = np.random.default_rng()
+        points = {}  # point distingué -> (départ, longueur)
+
+        def tasks():
+            while True:
+                starts = [int(value) for value in rng.integers(0, 1 << self.bits, trails_per_task, dtype=np.uint64)]
+                yield walk_trails, (self.algorithm, self.bits, self.seed, starts, dp_bits, max_length)
+
+        def handle(result):
+            trails, hashes = result
+            self.candidates += hashes
+            for start, point, length in trails:
+                previous = points.get(point)
+                if previous is None:
+                    points[point] = (start, length)
+                    continue
+                if previous[0] == start:
+                    continue
+                collision = self._locate(previous, (start, length))
+                if collision is not None:
+                    return collision
+            return None
+
+        found = self._run_tasks(executor, tasks(), handle, start_time)
+        if found is None:
+            return None
+        return tuple(self.seed + value.to_bytes(8, 'little') for value in found)
+
+    def _locate(self, trail_a, trail_b):
+        """Rejoue deux chemins aboutissant au même point pour trouver où ils se rejoignent"""
+        digest = _digest_function(self.algorithm)
+        (value_a, length_a), (value_b, length_b) = trail_a, trail_b
+        while length_a > length_b:
+            value_a = _step(digest, self.seed, self.bits, value_a)
+            length_a -= 1
+            self.candidates += 1
+        while length_b > length_a:
+            value_b = _step(digest, self.seed, self.bits, value_b)
+            length_b -= 1
+            self.candidates += 1
+        if value_a == value_b:
+            return None  # un départ se trouve sur l'autre chemin : pas de collision
+        while True:
+            next_a = _step(digest, self.seed, self.bits, value_a)
+            next_b = _step(digest, self.seed, self.bits, value_b)
+            self.candidates += 2
+            if next_a == next_b:
+                return value_a, value_b
+            value_a, value_b = next_a, next_b
+
+    # ======== RAPPORT =========
+
+    def _report(self, collision, elapsed):
+        rate = self.candidates / elapsed if elapsed else 0
+        report = {
+            'algorithm': self.algorithm,
+            'bits': self.bits,
+            'digest_bits': self.digest_bits,
+            'method': self.method,
+            'workers': self.workers,
+            'found': collision is not None,
+            'candidates': self.candidates,
+            'elapsed_s': elapsed,
+            'candidates_per_s': rate,
+            'birthday_bound': self.birthday_bound,
+            'candidates_vs_bound': self.candidates / self.birthday_bound,
+            'expected_time_s': self.birthday_bound / rate if rate else None,
+            # Même débit, condensat complet : ordre de grandeur en années
+            'full_digest_years': math.sqrt(math.pi / 2) * 2 ** (self.digest_bits / 2) / rate / (365.25 * 86400)
+            if rate else None,
+        }
+        if collision is not None:
+            digest = _digest_function(self.algorithm)
+            message_a, message_b = collision
+            digest_a, digest_b = digest(message_a), digest(message_b)
+            report['collision'] = {
+                'message_a': message_a.hex(),
+                'message_b': message_b.hex(),
+                'digest_a': digest_a.hex(),
+                'digest_b': digest_b.hex(),
+                'truncated': format(_truncate_one(digest_a, self.bits), f"0{(self.bits + 3) // 4}x"),
+                'verified': message_a != message_b
+                and _truncate_one(digest_a, self.bits) == _truncate_one(digest_b, self.bits),
+            }
+        return report
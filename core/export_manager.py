@@ -0,0 +1,218 @@
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime
+
+
+# Colonnes exportées, dans l'ordre
+EXPORT_FIELDS = ["timestamp", "operation_type", "algorithm", "key_label", "data_lenth", "duration"]
+
+_PERFORMANCES_START = re.compile(r'"performances"\s*:\s*\[')
+_DECODER = json.JSONDecoder()
+
+
+def iter_performance_records(data_file, chunk_size=65536):
+    """
+    Lit les enregistrements de `performances` un par un, sans charger le document
+
+    Le fichier est lu par morceaux de `chunk_size` caractères : la mémoire
+    utilisée est bornée par la taille d'un morceau et d'un enregistrement.
+    """
+    with open(data_file, "r") as f:
+        buffer = ""
+        # Recherche du début du tableau "performances"
+        while True:
+            match = _PERFORMANCES_START.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer = buffer[-64:] + chunk
+
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                record, end = _DECODER.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    if buffer:
+                        raise ValueError("Fichier de performances tronqué")
+                    return
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            yield record
+
+
+def iter_shard_records(shard_dir):
+    """
+    Enregistrements des fragments par processus pas encore fusionnés (lecture seule)
+
+    Une ligne incomplète (écriture en cours) est ignorée. Les fragments en
+    cours de fusion (`.jsonl.merging`) sont ignorés : leurs enregistrements
+    arrivent dans le fichier de données au même remplacement atomique.
+    """
+    if not shard_dir or not os.path.isdir(shard_dir):
+        return
+    for name in sorted(os.listdir(shard_dir)):
+        if not name.startswith("metrics-") or not name.endswith(".jsonl"):
+            continue
+        try:
+            with open(os.path.join(shard_dir, name), "r") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue  # fragment fusionné entre-temps
+
+
+def parse_time(value):
+    """Accepte un timestamp (secondes) ou une date ISO 8601"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+    return pa, pq
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture seule dont on récupère le contenu au fil de l'eau"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ExportManager:
+    """
+    Export en flux de l'historique des performances (CSV ou Parquet)
+
+    Les enregistrements sont filtrés et convertis au fil de la lecture, par
+    lots de `batch_size` : la mémoire reste constante quelle que soit la
+    taille de l'historique.
+    """
+
+    def __init__(self, data_file=None, batch_size=5000, shard_dir=None):
+        self.data_file = data_file or os.environ["data_file"]
+        self.batch_size = batch_size
+        self.shard_dir = shard_dir if shard_dir is not None else os.environ.get("metrics_shard_dir")
+
+    def _all_records(self):
+        yield from iter_performance_records(self.data_file)
+        yield from iter_shard_records(self.shard_dir)
+
+    def iter_records(self, operation_type=None, algorithm=None, since=None, until=None, key_label=None):
+        """Enregistrements filtrés par opération, algorithme, clé et intervalle de temps"""
+        for record in self._all_records():
+            if operation_type and record.get("operation_type") != operation_type:
+                continue
+            if key_label and record.get("key_label") != key_label:
+                continue
+            if algorithm and str(record.get("algorithm")) != str(algorithm):
+                continue
+            if since is not None or until is not None:
+                timestamp = record.get("timestamp")
+                if timestamp is None:
+                    continue
+                if since is not None and timestamp < since:
+                    continue
+                if until is not None and timestamp >= until:
+                    continue
+            yield record
+
+    def _batches(self, records):
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def stream_csv(self, records):
+        """Génère le CSV par morceaux de texte (en-tête puis un morceau par lot)"""
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        yield output.getvalue()
+
+        for batch in self._batches(records):
+            output.seek(0)
+            output.truncate()
+            writer.writerows(batch)
+            yield output.getvalue()
+
+    def stream_parquet(self, records):
+        """Génère un fichier Parquet par morceaux de bytes (un groupe de lignes par lot)"""
+        pa, pq = _import_pyarrow()
+
+        schema = pa.schema([
+            ("timestamp", pa.float64()),
+            ("operation_type", pa.string()),
+            ("algorithm", pa.string()),
+            ("key_label", pa.string()),
+            ("data_lenth", pa.int64()),
+            ("duration", pa.float64()),
+        ])
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        for batch in self._batches(records):
+            columns = {name: [] for name in schema.names}
+            for record in batch:
+                columns["timestamp"].append(record.get("timestamp"))
+                columns["operation_type"].append(record.get("operation_type"))
+                algorithm = record.get("algorithm")
+                columns["algorithm"].append(None if algorithm is None else str(algorithm))
+                columns["key_label"].append(record.get("key_label"))
+                columns["data_lenth"].append(record.get("data_lenth"))
+                columns["duration"].append(record.get("duration"))
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    def stream(self, export_format="csv", **filters):
+        """Export dans le format demandé ('csv' ou 'parquet')"""
+        records = self.iter_records(**filters)
+        if export_format == "parquet":
+            _import_pyarrow()  # erreur immédiate plutôt qu'en cours de flux
+            return self.stream_parquet(records)
+        if export_format == "csv":
+            return self.stream_csv(records)
+        raise ValueError(f"Format d'export non supporté: {export_format}")
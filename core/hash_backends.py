@@ -0,0 +1,176 @@
+import hashlib
+import os
+import time
+
+from cryptography.hazmat.primitives import hashes as crypto_hashes
+
+from utils.singleton_metaclass import SingletonMeta
+
+# Classes de taille d'entrée : (borne supérieure en octets, nom, taille de l'échantillon de calibrage)
+SIZE_CLASSES = (
+    (1024, 'small', 64),
+    (65536, 'medium', 16 * 1024),
+    (None, 'large', 256 * 1024),
+)
+
+
+def size_class(length):
+    for upper_bound, name, _ in SIZE_CLASSES:
+        if upper_bound is None or length <= upper_bound:
+            return name
+
+
+class _CryptographyHash:
+    """Adapte `cryptography.hazmat.primitives.hashes.Hash` à l'interface hashlib"""
+
+    def __init__(self, algorithm):
+        self._hash = crypto_hashes.Hash(algorithm)
+        self._digest = None
+
+    def update(self, data):
+        self._hash.update(data)
+
+    def digest(self):
+        if self._digest is None:
+            self._digest = self._hash.finalize()
+        return self._digest
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+
+class HashBackendRegistry(metaclass=SingletonMeta):
+    """
+    Registre des implémentations de hachage disponibles
+
+    Un algorithme peut avoir plusieurs implémentations (hashlib, cryptography,
+    blake3, xxhash...). Au démarrage, un micro-benchmark choisit la plus
+    rapide par algorithme et par classe de taille d'entrée.
+
+    Configuration (.env) :
+        hash_backend_<algo>  impose une implémentation, ex: hash_backend_sha256=cryptography
+        hash_benchmark       0 pour désactiver le calibrage (premier backend enregistré)
+    """
+
+    def __init__(self):
+        self.backends = {}   # algo -> {nom du backend: fabrique}
+        self.secure = {}     # algo -> bool (False : somme de contrôle non cryptographique)
+        self.selection = {}  # (algo, classe de taille) -> nom du backend
+        self._register_defaults()
+        if os.environ.get("hash_benchmark", "1") != "0":
+            self.calibrate()
+
+    def register(self, algorithm, backend_name, factory, secure=True):
+        self.backends.setdefault(algorithm, {})[backend_name] = factory
+        self.secure[algorithm] = secure
+
+    def _register_defaults(self):
+        for algorithm in ('md5', 'sha1', 'sha256', 'sha512', 'sha3_256', 'sha3_512', 'blake2b', 'blake2s'):
+            self.register(algorithm, 'hashlib', getattr(hashlib, algorithm))
+
+        crypto_algorithms = {
+            'md5': crypto_hashes.MD5,
+            'sha1': crypto_hashes.SHA1,
+            'sha256': crypto_hashes.SHA256,
+            'sha512': crypto_hashes.SHA512,
+            'sha3_256': crypto_hashes.SHA3_256,
+            'sha3_512': crypto_hashes.SHA3_512,
+            'blake2b': lambda: crypto_hashes.BLAKE2b(64),
+            'blake2s': lambda: crypto_hashes.BLAKE2s(32),
+        }
+        for algorithm, crypto_algorithm in crypto_algorithms.items():
+            self.register(algorithm, 'cryptography',
+                          lambda crypto_algorithm=crypto_algorithm: _CryptographyHash(crypto_algorithm()))
+
+        # Dépendances optionnelles
+        try:
+            import blake3
+            self.register('blake3', 'blake3', blake3.blake3)
+        except ImportError:
+            pass
+        try:
+            import xxhash
+            # Sommes de contrôle rapides, sans propriété cryptographique
+            self.register('xxh64', 'xxhash', xxhash.xxh64, secure=False)
+            self.register('xxh3_64', 'xxhash', xxhash.xxh3_64, secure=False)
+            self.register('xxh3_128', 'xxhash', xxhash.xxh3_128, secure=False)
+        except ImportError:
+            pass
+
+    def algorithms(self):
+        return list(self.backends)
+
+    def is_secure(self, algorithm):
+        return self.secure.get(algorithm, False)
+
+    def calibrate(self, repeat=3):
+        """Mesure chaque implémentation et retient la plus rapide par classe de taille"""
+        for algorithm, backends in self.backends.items():
+            if len(backends) == 1:
+                continue
+            for _, class_name, sample_size in SIZE_CLASSES:
+                sample = os.urandom(sample_size)
+                iterations = max(1, (128 * 1024) // sample_size)
+                timings = {}
+                for backend_name, factory in backends.items():
+                    best = None
+                    for _ in range(repeat):
+                        start_time = time.perf_counter()
+                        for _ in range(iterations):
+                            hash_object = factory()
+                            hash_object.update(sample)
+                            hash_object.digest()
+                        elapsed = time.perf_counter() - start_time
+                        best = elapsed if best is None else min(best, elapsed)
+                    timings[backend_name] = best
+                self.selection[(algorithm, class_name)] = min(timings, key=timings.get)
+
+    def select(self, algorithm, length=0):
+        """Nom de l'implémentation utilisée pour cet algorithme et cette taille"""
+        if algorithm not in self.backends:
+            raise ValueError(f"Algorithme non supporté: {algorithm}")
+        override = os.environ.get(f"hash_backend_{algorithm}")
+        if override:
+            if override not in self.backends[algorithm]:
+                raise ValueError(f"Backend '{override}' indisponible pour {algorithm}")
+            return override
+        return self.selection.get((algorithm, size_class(length)), next(iter(self.backends[algorithm])))
+
+    def factory(self, algorithm, length=0):
+        return self.backends[algorithm][self.select(algorithm, length)]
+
+    def new(self, algorithm, length=0):
+        """Nouvel objet de hachage (update / digest / hexdigest)"""
+        return self.factory(algorithm, length)()
+
+    def digest_function(self, algorithm, length=0):
+        """
+        Fonction message -> condensat (bytes), pour hacher de nombreux petits messages
+
+        Les constructeurs qui acceptent les données (hashlib, blake3, xxhash)
+        évitent un appel à `update` par message.
+        """
+        factory = self.factory(algorithm, length)
+        try:
+            factory(b'')
+
+            def digest(message):
+                return factory(message).digest()
+        except TypeError:
+            def digest(message):
+                hash_object = factory()
+                hash_object.update(message)
+                return hash_object.digest()
+        return digest
+
+    def describe(self):
+        """Implémentations disponibles et sélection par classe de taille"""
+        return {
+            algorithm: {
+                'backends': list(backends),
+                'secure': self.is_secure(algorithm),
+                'selected': {class_name: self.select(algorithm, upper_bound or sample_size)
+                             for upper_bound, class_name, sample_size in SIZE_CLASSES},
+            }
+            for algorithm, backends in self.backends.items()
+        }
@@ -1,10 +1,10 @@
-﻿import hashlib
-import json
-import os
+﻿import os
 import time
 
-from cryptography.hazmat.primitives import hashes as crypto_hashes
-from cryptography.hazmat.backends import default_backend
+from core.avalanche import avalanche_statistics
+from core.collision_search import CollisionSearch
+from core.hash_backends import HashBackendRegistry
+from core.metrics_manager import MetricsManager
 
 class HashManager:
     """
@@ -13,14 +13,15 @@ class HashManager:
     """
     
     def __init__(self):
+        # Implémentations choisies au démarrage (voir HashBackendRegistry)
+        self.registry = HashBackendRegistry()
         self.supported_algorithms = {
-            'md5': hashlib.md5,
-            'sha1': hashlib.sha1,
-            'sha256': hashlib.sha256,
-            'sha512': hashlib.sha512,
-            'sha3_256': hashlib.sha3_256,
-            'sha3_512': hashlib.sha3_512
+            algorithm: self.registry.factory(algorithm)
+            for algorithm in self.registry.algorithms()
         }
+        # Sommes de contrôle non cryptographiques (xxhash) exclues de la signature
+        self.signing_algorithms = [algorithm for algorithm in self.supported_algorithms
+                                   if self.registry.is_secure(algorithm)]
     
     def compute_hash(self, data, algorithm='sha256'):
         """
@@ -31,39 +32,58 @@ class HashManager:
             raise ValueError(f"Algorithme non supporté: {algorithm}")
 
         data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-        
-        if algorithm in ['sha256', 'sha512']:
-            # Utilisation de cryptography pour certains algorithmes
-            start_time = time.time()
-            digest = crypto_hashes.Hash(
-                getattr(crypto_hashes, algorithm.upper())(),
-                backend=default_backend()
-            )
-            digest.update(data_bytes)
-            end_time = time.time()
 
-            duration = end_time - start_time
+        # Implémentation la plus rapide pour cette taille d'entrée
+        backend = self.registry.select(algorithm, len(data_bytes))
+        start_time = time.time()
+        hash_func = self.registry.backends[algorithm][backend]()
+        hash_func.update(data_bytes)
+        hex_digest = hash_func.hexdigest()
+        end_time = time.time()
+        duration = end_time - start_time
+
+        self.write_to_json({"algorithm": algorithm,
+                            "backend": backend,
+                            "data_lenth": len(data),
+                            "duration": duration,
+                            "operation_type": "hash"
+                            })
+        return hex_digest
+
+    def compute_file_hash(self, path, algorithm='sha256', chunk_size=1 << 20):
+        """
+        Calcule le hash d'un fichier lu par morceaux (mémoire bornée)
+        Chapitre 8 : Fonctions de hachage cryptographiques
+        """
+        if algorithm not in self.supported_algorithms:
+            raise ValueError(f"Algorithme non supporté: {algorithm}")
+
+        size = os.path.getsize(path)
+        backend = self.registry.select(algorithm, size)
+        start_time = time.time()
+        hash_func = self.registry.backends[algorithm][backend]()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hash_func.update(chunk)
+        hex_digest = hash_func.hexdigest()
+        duration = time.time() - start_time
+
+        self.write_to_json({"algorithm": algorithm,
+                            "backend": backend,
+                            "data_lenth": size,
+                            "duration": duration,
+                            "operation_type": "hash"
+                            })
+        return hex_digest
+
+    def check_signing_algorithm(self, algorithm):
+        """
+        Refuse les algorithmes inutilisables pour une signature
+        Chapitre 9 : Signature d'un condensat
+        """
+        if algorithm not in self.signing_algorithms:
+            raise ValueError(f"Algorithme non utilisable pour une signature: {algorithm}")
 
-            self.write_to_json({"algorithm": algorithm,
-                                "data_lenth": len(data),
-                                "duration": duration,
-                                "operation_type": "hash"
-                                })
-            return digest.finalize().hex()
-        else:
-            # Utilisation de hashlib pour les autres
-            start_time = time.time()
-            hash_func = self.supported_algorithms[algorithm]()
-            hash_func.update(data_bytes)
-            end_time = time.time()
-            duration = end_time - start_time
-            self.write_to_json({"algorithm": algorithm,
-                                "data_lenth": len(data),
-                                "duration": duration,
-                                "operation_type": "hash"
-                                })
-            return hash_func.hexdigest()
-    
     def verify_integrity(self, data, expected_hash, algorithm='sha256'):
         """
         Vérifie l'intégrité des données en comparant les hash
@@ -102,7 +122,33 @@ class HashManager:
         
         return results
     
-    def demonstrate_collision_resistance(self):
+    def search_collision(self, algorithm='sha256', bits=32, workers=None, max_seconds=60):
+        """
+        Attaque des anniversaires sur un condensat tronqué à `bits` bits
+        Chapitre 8 : Paradoxe des anniversaires (voir core.collision_search)
+        """
+        report = CollisionSearch(algorithm, bits, workers=workers, max_seconds=max_seconds).run()
+        self.write_to_json({"algorithm": algorithm,
+                            "data_lenth": report['candidates'],
+                            "duration": report['elapsed_s'],
+                            "operation_type": "collision_search",
+                            "bits": bits,
+                            "found": report['found']
+                            })
+        return report
+
+    def analyze_avalanche(self, algorithms=None, samples=10000, input_size=32):
+        """
+        Effet avalanche mesuré sur `samples` entrées aléatoires par algorithme
+        Chapitre 8 : Propriétés cryptographiques du hachage (voir core.avalanche)
+        """
+        algorithms = algorithms or list(self.supported_algorithms)
+        for algorithm in algorithms:
+            if algorithm not in self.supported_algorithms:
+                raise ValueError(f"Algorithme non supporté: {algorithm}")
+        return {algorithm: avalanche_statistics(algorithm, samples, input_size) for algorithm in algorithms}
+
+    def demonstrate_collision_resistance(self, algorithm='sha256', bits=24):
         """
         Démontre le concept de résistance aux collisions
         Chapitre 8 : Propriétés cryptographiques du hachage
@@ -138,13 +184,20 @@ class HashManager:
             'description': 'Le hash a toujours la même taille quelle que soit l\'entrée',
             'sizes': hash_sizes
         })
+
+        # Exemple 3 : Collision réelle sur un condensat tronqué (paradoxe des anniversaires)
+        report = self.search_collision(algorithm, bits, workers=1, max_seconds=10)
+        examples.append({
+            'concept': 'Paradoxe des anniversaires',
+            'description': f"Collision trouvée sur les {bits} premiers bits de {algorithm} après "
+                           f"{report['candidates']} essais (borne ≈ {report['birthday_bound']:.0f}). "
+                           f"Au même débit, le condensat complet ({report['digest_bits']} bits) "
+                           f"demanderait ≈ {report['full_digest_years']:.2e} ans.",
+            'collision': report.get('collision'),
+            'search': report
+        })
         
         return examples
 
     def write_to_json(self, data):
-        with open(os.environ["data_file"], 'r+') as file:
-            file_data = json.load(file)
-            print(file_data)
-            file_data["database"]["performances"].append(data)
-            file.seek(0)
-            json.dump(file_data, file, indent=4)
\ No newline at end of file
+        MetricsManager().record(data)
\ No newline at end of file
@@ -1,15 +1,96 @@
-import json
+import hashlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 
 import pkcs11
 from pkcs11 import KeyType, Mechanism
 import os
+import threading
 import time
 
+try:
+    from pkcs11.mechanisms import GCMParams
+except ImportError:  # versions de python-pkcs11 sans support GCM
+    GCMParams = None
+from pkcs11.util.ec import encode_ec_public_key, encode_named_curve_parameters
+
+from core import batch_verifier
 from core.hash_manager import HashManager
+from core.key_usage_index import KeyUsageIndex
+from core.metrics_manager import MetricsManager
+from core.process_pool import ProcessPool
 from utils.singleton_metaclass import SingletonMeta
 import pkcs11
 
 
+# Modes AES supportés : (octet d'en-tête, mécanisme PKCS#11, taille de l'IV/nonce)
+AES_MODES = {
+    'CBC': (b'\x01', Mechanism.AES_CBC_PAD, 16),
+    'GCM': (b'\x02', Mechanism.AES_GCM, 12),
+}
+
+# Préfixe des labels temporaires des clés pré-générées (voir KeyPoolManager)
+POOL_LABEL_PREFIX = '_pool_'
+
+# Courbes nommées : taille de clé demandée -> nom de courbe
+EC_CURVES = {
+    256: 'secp256r1',
+    384: 'secp384r1',
+    521: 'secp521r1',
+}
+
+# Courbes Edwards (EdDSA) : nom -> OID
+EDWARDS_CURVES = {
+    'ed25519': '1.3.101.112',
+    'ed448': '1.3.101.113',
+}
+
+# Taille en bits des courbes, par nom (EC) ou OID (EdDSA)
+CURVE_SIZES = {
+    'secp256r1': 256,
+    'secp384r1': 384,
+    'secp521r1': 521,
+    '1.3.101.112': 256,
+    '1.3.101.113': 448,
+}
+
+# Hachage appliqué avant ECDSA (le mécanisme CKM_ECDSA signe un condensat)
+ECDSA_DIGESTS = {
+    'secp256r1': 'sha256',
+    'secp384r1': 'sha384',
+    'secp521r1': 'sha512',
+}
+
+
+def _iter_chunks(data, chunk_size):
+    """Découpe des bytes en morceaux de `chunk_size` octets"""
+    for offset in range(0, len(data), chunk_size):
+        yield data[offset:offset + chunk_size]
+
+
+def _read_header(chunks, header_size):
+    """
+    Extrait les `header_size` premiers octets d'un flux de morceaux
+
+    Returns:
+        tuple: (en-tête, itérateur sur le reste du flux)
+    """
+    chunks = iter(chunks)
+    header = b''
+    for chunk in chunks:
+        header += chunk
+        if len(header) >= header_size:
+            break
+    if len(header) < header_size:
+        raise ValueError("Flux chiffré tronqué (en-tête incomplet)")
+
+    def rest():
+        if len(header) > header_size:
+            yield header[header_size:]
+        yield from chunks
+
+    return header[:header_size], rest()
+
 
 class HSMManager(metaclass=SingletonMeta):
     """
@@ -24,6 +105,20 @@ class HSMManager(metaclass=SingletonMeta):
         self.token_label = os.environ['token_label']
         self.database = None
         self.hash_manager = HashManager()
+        self.key_usage = KeyUsageIndex()
+        # Processus dans lequel la bibliothèque PKCS#11 a été initialisée (C_Initialize)
+        self._lib_pid = None
+        self._lib_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """
+        Dans un processus fils (worker gunicorn) : la session héritée du parent
+        n'est pas utilisable, chaque worker ouvre la sienne au premier appel
+        (la bibliothèque est réinitialisée alors, voir `_library`)
+        """
+        self.session = None
+        self._lib_lock = threading.Lock()
 
     def _resolve_key_type(self, key_type):
         if key_type == "AES":
@@ -37,8 +132,71 @@ class HSMManager(metaclass=SingletonMeta):
                 return KeyType.RSA
             if normalized in ('EC', 'ECC', 'ECDSA') and hasattr(KeyType, 'EC'):
                 return getattr(KeyType, 'EC')
+            if normalized in ('EDDSA', 'ED25519', 'ED448', 'EC_EDWARDS') and hasattr(KeyType, 'EC_EDWARDS'):
+                return getattr(KeyType, 'EC_EDWARDS')
         return KeyType.RSA
 
+    def _resolve_curve(self, key_type, key_size=None, curve=None):
+        """
+        Détermine la courbe nommée à utiliser pour une clé EC / EdDSA
+
+        Returns:
+            str: Nom (EC) ou OID (EdDSA) de la courbe
+        """
+        if key_type == getattr(KeyType, 'EC_EDWARDS', None):
+            name = (curve or 'ed25519').strip().lower()
+            if name not in EDWARDS_CURVES:
+                raise ValueError(f"Courbe EdDSA non supportée: {curve}")
+            return EDWARDS_CURVES[name]
+        if curve:
+            name = curve.strip().lower()
+            if name in ('p-256', 'p256', 'prime256v1'):
+                return 'secp256r1'
+            if name in ('p-384', 'p384'):
+                return 'secp384r1'
+            if name in ('p-521', 'p521'):
+                return 'secp521r1'
+            if name in EC_CURVES.values():
+                return name
+            raise ValueError(f"Courbe EC non supportée: {curve}")
+        return EC_CURVES.get(int(key_size) if key_size else 256, 'secp256r1')
+
+    def _select_mechanism(self, key):
+        """Choisit le mécanisme de signature selon le type de la clé"""
+        if key.key_type == KeyType.EC:
+            return Mechanism.ECDSA
+        if key.key_type == getattr(KeyType, 'EC_EDWARDS', None):
+            return Mechanism.EDDSA
+        return Mechanism.RSA_PKCS
+
+    def _prepare_sign_payload(self, key, data_bytes, mechanism):
+        """
+        Prépare les octets réellement signés par le token
+
+        CKM_ECDSA ne hache pas : on lui transmet le condensat adapté à la courbe.
+        """
+        if mechanism != Mechanism.ECDSA:
+            return data_bytes
+        digest = 'sha256'
+        try:
+            ec_params = key[pkcs11.Attribute.EC_PARAMS]
+            for curve_name, curve_digest in ECDSA_DIGESTS.items():
+                if ec_params == encode_named_curve_parameters(curve_name):
+                    digest = curve_digest
+                    break
+        except Exception:
+            pass
+        return hashlib.new(digest, data_bytes).digest()
+
+    def _ensure_active(self, label_key):
+        """Refuse toute opération avec une clé désactivée (voir KeyUsageIndex)"""
+        if not self.key_usage.is_active(label_key):
+            raise PermissionError(f"La clé '{label_key}' est désactivée")
+
+    def _data_hash(self, data_bytes):
+        """Empreinte courte des données traitées, affichée dans l'historique de la clé"""
+        return hashlib.sha256(data_bytes).hexdigest()[:16]
+
     def _sanitize_label(self, key_label, fallback):
         if isinstance(key_label, str):
             cleaned = key_label.strip()
@@ -57,18 +215,51 @@ class HSMManager(metaclass=SingletonMeta):
             object: Session HSM ouverte ou None en cas d'erreur
         """
         try:
-            lib = pkcs11.lib(self.lib_path)
-            token = lib.get_token(token_label=self.token_label)
-            self.session = token.open(user_pin=self.pin, rw=True)
+            self.session = self.open_session()
             print("HSM connecté")
             return self.session
         except Exception as e:
             print(f"Erreur connexion: {e}")
             return None
 
-    def generate_key_pair(self, key_type=KeyType.RSA, key_size=None, key_label=None):
+    def open_session(self):
+        """
+        Ouvre une nouvelle session sur le token, indépendante de `self.session`
+
+        Utile pour les traitements en arrière-plan : une session PKCS#11 ne doit
+        pas être utilisée simultanément par plusieurs threads.
+        """
+        token = self._library().get_token(token_label=self.token_label)
+        try:
+            return token.open(user_pin=self.pin, rw=True)
+        except pkcs11.exceptions.UserAlreadyLoggedIn:
+            # Le login est partagé par toutes les sessions de l'application
+            return token.open(rw=True)
+
+    def _library(self):
+        """
+        Bibliothèque PKCS#11 initialisée dans le processus courant
+
+        python-pkcs11 garde la bibliothèque chargée dans un cache de module :
+        après un fork, le fils hérite d'un état C_Initialize qui appartient au
+        parent. Le premier appel dans un nouveau processus (pid différent) la
+        réinitialise (C_Finalize puis C_Initialize, python-pkcs11 >= 0.10).
+        """
+        with self._lib_lock:
+            lib = pkcs11.lib(self.lib_path)
+            if self._lib_pid is not None and self._lib_pid != os.getpid():
+                lib.reinitialize()
+            self._lib_pid = os.getpid()
+            return lib
+
+    def generate_key_pair(self, key_type=KeyType.RSA, key_size=None, key_label=None, curve=None, session=None):
         """
-        Générer une paire de clés RSA 2048 bits dans le HSM
+        Générer une paire de clés dans le HSM (RSA, EC ou EdDSA)
+
+        Args:
+            key_size (int): Taille RSA, ou taille de courbe EC (256, 384, 521)
+            curve (str): Courbe nommée optionnelle (ex: 'P-256', 'ed25519')
+            session (Session): Session à utiliser à la place de `self.session`
 
         Returns:
             tuple: (clé_publique, clé_privée) ou (None, None) en cas d'erreur
@@ -77,9 +268,13 @@ class HSMManager(metaclass=SingletonMeta):
             resolved_type = self._resolve_key_type(key_type)
             resolved_size = int(key_size) if key_size is not None else int(os.environ.get("key_size", 2048))
             label = self._sanitize_label(key_label, f"{resolved_type.name.lower()}_key_{int(time.time())}")
-            if not self.session:
-                self.connect()
-            public_key, private_key = self.session.generate_keypair(
+            if session is None:
+                if not self.session:
+                    self.connect()
+                session = self.session
+            if resolved_type in (KeyType.EC, getattr(KeyType, 'EC_EDWARDS', None)):
+                return self._generate_ec_key_pair(session, resolved_type, resolved_size, label, curve)
+            public_key, private_key = session.generate_keypair(
                 key_type=resolved_type,
                 key_length=resolved_size,
                 label=label,
@@ -91,6 +286,56 @@ class HSMManager(metaclass=SingletonMeta):
             print(f"Erreur génération: {e}")
             return None, None
 
+    def _generate_ec_key_pair(self, session, key_type, key_size, label, curve=None):
+        """Génère une paire EC / EdDSA à partir des paramètres de domaine de la courbe"""
+        curve_name = self._resolve_curve(key_type, key_size if key_size in EC_CURVES else None, curve)
+        parameters = session.create_domain_parameters(key_type, {
+            pkcs11.Attribute.EC_PARAMS: encode_named_curve_parameters(curve_name),
+        }, local=True)
+
+        mechanism = None
+        if key_type == getattr(KeyType, 'EC_EDWARDS', None):
+            mechanism = Mechanism.EC_EDWARDS_KEY_PAIR_GEN
+        public_key, private_key = parameters.generate_keypair(
+            mechanism=mechanism,
+            label=label,
+            store=True
+        )
+        print("Clés {} générées et conservées dans le HSM, label : {}".format(curve_name, label))
+        return public_key, private_key
+
+    def generate_secret_key(self, key_type=KeyType.AES, key_size=None, key_label=None):
+        """
+        Générer une clé symétrique (AES) qui reste dans le HSM
+
+        Args:
+            key_size (int): Taille en bits (128, 192 ou 256)
+            key_label (str): Label de la clé
+
+        Returns:
+            SecretKey: Clé générée ou None en cas d'erreur
+        """
+        try:
+            resolved_type = self._resolve_key_type(key_type)
+            resolved_size = int(key_size) if key_size is not None else 256
+            if resolved_size not in (128, 192, 256):
+                print(f"Taille AES invalide ({resolved_size}), utilisation de 256 bits")
+                resolved_size = 256
+            label = self._sanitize_label(key_label, f"{resolved_type.name.lower()}_key_{int(time.time())}")
+            if not self.session:
+                self.connect()
+            secret_key = self.session.generate_key(
+                resolved_type,
+                resolved_size,
+                label=label,
+                store=True
+            )
+            print("Clé secrète générée et conservée dans le HSM, label : {}".format(label))
+            return secret_key
+        except Exception as e:
+            print(f"Erreur génération clé secrète: {e}")
+            return None
+
     def debug_keys(self):
         """
         Méthode de débogage pour lister toutes les clés présentes dans le HSM
@@ -127,12 +372,14 @@ class HSMManager(metaclass=SingletonMeta):
         except Exception as e:
             print(f"Erreur débogage: {e}")
 
-    def sign_data(self, data, label_key, mechanism=Mechanism.RSA_PKCS):
+    def sign_data(self, data, label_key, mechanism=None):
         """
         Signer des données avec la clé privée du HSM
 
         Args:
             data (str): Données à signer
+            mechanism (Mechanism): Mécanisme imposé, sinon choisi selon le type de clé
+                (RSA_PKCS, ECDSA ou EDDSA)
 
         Returns:
             str: Signature en hexadécimal ou None en cas d'erreur
@@ -140,6 +387,7 @@ class HSMManager(metaclass=SingletonMeta):
         try:
             # Vérifier la connexion HSM
             data = data.strip()
+            self._ensure_active(label_key)
             if not self.session:
                 self.connect()
             # Rechercher toutes les clés privées disponibles
@@ -156,10 +404,13 @@ class HSMManager(metaclass=SingletonMeta):
             private_key = private_keys[0]
             print("Clé trouvée, signature en cours...")
 
-            # Créer la signature avec l'algorithme RSA-PKCS
+            if mechanism is None:
+                mechanism = self._select_mechanism(private_key)
+
+            # Créer la signature avec le mécanisme adapté à la clé
             start_time = time.time()
             signature = private_key.sign(
-                data.encode('utf-8'),
+                self._prepare_sign_payload(private_key, data.encode('utf-8'), mechanism),
                 mechanism=mechanism
             )
             end_time = time.time()
@@ -170,6 +421,9 @@ class HSMManager(metaclass=SingletonMeta):
                                 "data_lenth": len(data),
                                 "duration": duration,
                                 "operation_type": "sign_data",
+                                "key_label": label_key,
+                                "data_hash": self._data_hash(data.encode('utf-8')),
+                                "signature_preview": signature.hex()[:16],
                                 })
             print("Signature réussie")
             # Retourner la signature en format hexadécimal (plus facile à transmettre)
@@ -181,7 +435,7 @@ class HSMManager(metaclass=SingletonMeta):
 
 
     def verify_signature(self, data: str, signature, label_key: str,
-                         mechanism: Mechanism = Mechanism.RSA_PKCS) -> bool:
+                         mechanism: Mechanism = None) -> bool:
         """
         Vérifier une signature avec la clé publique correspondante.
 
@@ -189,7 +443,8 @@ class HSMManager(metaclass=SingletonMeta):
             data (str): Données originales qui ont été signées.
             signature (str|bytes): Signature à vérifier (hexadécimal ou bytes).
             label_key (str): Label de la clé publique dans le HSM.
-            mechanism (Mechanism): Mécanisme PKCS#11 utilisé pour la signature.
+            mechanism (Mechanism): Mécanisme PKCS#11 utilisé pour la signature
+                (déduit du type de clé si absent).
 
         Returns:
             bool: True si la signature est valide, False sinon.
@@ -197,6 +452,7 @@ class HSMManager(metaclass=SingletonMeta):
         data = data.strip()
         try:
             print(f"[VERIFY] Données: {data!r}")
+            self._ensure_active(label_key)
 
             if not self.session:
                 self.connect()
@@ -228,15 +484,28 @@ class HSMManager(metaclass=SingletonMeta):
 
             print(f"[VERIFY] Longueur signature: {len(signature_bytes)} octets")
 
-            data_bytes = data.encode("utf-8")
+            if mechanism is None:
+                mechanism = self._select_mechanism(public_key)
+
+            data_bytes = self._prepare_sign_payload(public_key, data.encode("utf-8"), mechanism)
 
             print(f"[VERIFY] Tentative de vérification (mechanism={mechanism})...")
             # python-pkcs11 : lève SignatureInvalid si la signature est incorrecte
+            start_time = time.time()
             status = public_key.verify(
                 data_bytes,
                 signature_bytes,
                 mechanism=mechanism,
             )
+            self.write_to_json({"algorithm": mechanism,
+                                "data_lenth": len(data),
+                                "duration": time.time() - start_time,
+                                "operation_type": "verify_signature",
+                                "key_label": label_key,
+                                "data_hash": self._data_hash(data.encode('utf-8')),
+                                "signature_preview": signature_bytes.hex()[:16],
+                                "success": bool(status),
+                                })
 
             # Selon l’implémentation, `verify` renvoie typiquement True.
             # On force un booléen explicite par sécurité.
@@ -250,14 +519,18 @@ class HSMManager(metaclass=SingletonMeta):
             traceback.print_exc()
             return False
 
-    def encrypt_data(self, data, label_key, mechanism=Mechanism.RSA_PKCS):
-        """Chiffrer des données avec une clé publique spécifique"""
+    def encrypt_data(self, data, label_key, mechanism=Mechanism.RSA_PKCS, aes_mode='GCM'):
+        """Chiffrer des données avec une clé publique (RSA) ou une clé secrète (AES)"""
         try:
             print(f"Tentative de chiffrement: '{data}'")
+            self._ensure_active(label_key)
 
             if not self.session:
                 self.connect()
 
+            if self._find_secret_key(label_key) is not None:
+                return self.encrypt_data_aes(data, label_key, mode=aes_mode)
+
             print(f"Je suis connecté {label_key}")
             # Rechercher les clés publiques
             public_keys = list(self.session.get_objects({
@@ -299,7 +572,9 @@ class HSMManager(metaclass=SingletonMeta):
             self.write_to_json({"algorithm": public_key.key_type.name,
                                 "data_lenth": len(data),
                                 "duration": duration,
-                                "operation_type": "encrypt_data"
+                                "operation_type": "encrypt_data",
+                                "key_label": label_key,
+                                "data_hash": self._data_hash(data_bytes),
                                 })
 
             return encrypted_data.hex()
@@ -314,10 +589,14 @@ class HSMManager(metaclass=SingletonMeta):
         """Déchiffrer des données avec une clé privée spécifique"""
         try:
             print(f"Tentative de déchiffrement")
+            self._ensure_active(label_key)
 
             if not self.session:
                 self.connect()
 
+            if self._find_secret_key(label_key) is not None:
+                return self.decrypt_data_aes(encrypted_data_hex, label_key)
+
             # Rechercher les clés privées
             private_keys = list(self.session.get_objects({
                 pkcs11.Attribute.CLASS: pkcs11.ObjectClass.PRIVATE_KEY,
@@ -346,7 +625,9 @@ class HSMManager(metaclass=SingletonMeta):
 
             self.write_to_json({"data_lenth": len(encrypted_data_hex),
                                 "duration": duration,
-                                "operation_type": "decrypt_data"
+                                "operation_type": "decrypt_data",
+                                "key_label": label_key,
+                                "data_hash": self._data_hash(encrypted_data),
                                 })
             # Essayer de décoder en UTF-8, sinon retourner en hexadécimal
             try:
@@ -368,16 +649,182 @@ class HSMManager(metaclass=SingletonMeta):
             traceback.print_exc()
             return None
 
-    def generate_key_pair_with_storage(self, key_size=2048, key_type='RSA', key_label=None):
+    def _find_secret_key(self, label_key):
+        """Retourne la clé secrète portant ce label, ou None"""
+        if not label_key:
+            return None
+        secret_keys = list(self.session.get_objects({
+            pkcs11.Attribute.CLASS: pkcs11.ObjectClass.SECRET_KEY,
+            pkcs11.Attribute.LABEL: label_key
+        }))
+        return secret_keys[0] if secret_keys else None
+
+    def _aes_mechanism_param(self, mode, iv):
+        if mode == 'GCM':
+            if GCMParams is None:
+                raise ValueError("AES-GCM non supporté par cette version de python-pkcs11")
+            return GCMParams(iv)
+        return iv
+
+    def encrypt_stream(self, chunks, label_key, mode='GCM', buffer_size=None):
+        """
+        Chiffrer un flux de données avec une clé AES du HSM (C_EncryptInit/Update/Final)
+
+        Les morceaux sont envoyés au token au fur et à mesure : la mémoire utilisée
+        reste bornée par `buffer_size` quelle que soit la taille totale.
+
+        Args:
+            chunks (iterable): Morceaux de bytes à chiffrer
+            label_key (str): Label de la clé AES
+            mode (str): 'GCM' ou 'CBC'
+
+        Yields:
+            bytes: En-tête (mode + IV/nonce) puis les morceaux chiffrés
+        """
+        mode = mode.upper()
+        if mode not in AES_MODES:
+            raise ValueError(f"Mode AES non supporté: {mode}")
+        header, mechanism, iv_size = AES_MODES[mode]
+
+        self._ensure_active(label_key)
+        if not self.session:
+            self.connect()
+        secret_key = self._find_secret_key(label_key)
+        if secret_key is None:
+            raise ValueError(f"Aucune clé AES trouvée pour le label '{label_key}'")
+
+        iv = self.session.generate_random(iv_size * 8)
+        buffer_size = buffer_size or int(os.environ.get("aes_chunk_size", 65536))
+
+        yield header + iv
+        yield from secret_key.encrypt(
+            chunks,
+            mechanism=mechanism,
+            mechanism_param=self._aes_mechanism_param(mode, iv),
+            buffer_size=buffer_size + 32  # marge pour le padding / le tag
+        )
+
+    def decrypt_stream(self, chunks, label_key, buffer_size=None):
+        """
+        Déchiffrer un flux produit par `encrypt_stream`
+
+        Le mode et l'IV sont lus dans l'en-tête du flux.
+
+        Yields:
+            bytes: Morceaux déchiffrés
+        """
+        self._ensure_active(label_key)
+        if not self.session:
+            self.connect()
+        secret_key = self._find_secret_key(label_key)
+        if secret_key is None:
+            raise ValueError(f"Aucune clé AES trouvée pour le label '{label_key}'")
+
+        mode_byte, chunks = _read_header(chunks, 1)
+        modes = {header: mode for mode, (header, _, _) in AES_MODES.items()}
+        if mode_byte not in modes:
+            raise ValueError("En-tête de chiffrement AES inconnu")
+        mode = modes[mode_byte]
+        _, mechanism, iv_size = AES_MODES[mode]
+        iv, chunks = _read_header(chunks, iv_size)
+
+        buffer_size = buffer_size or int(os.environ.get("aes_chunk_size", 65536))
+        yield from secret_key.decrypt(
+            chunks,
+            mechanism=mechanism,
+            mechanism_param=self._aes_mechanism_param(mode, iv),
+            buffer_size=buffer_size + 32
+        )
+
+    def encrypt_data_aes(self, data, label_key, mode='GCM'):
+        """Chiffrer des données avec une clé AES du HSM, résultat en hexadécimal"""
+        try:
+            data_bytes = data.encode('utf-8') if isinstance(data, str) else data
+            chunk_size = int(os.environ.get("aes_chunk_size", 65536))
+
+            start_time = time.time()
+            encrypted_data = b''.join(self.encrypt_stream(_iter_chunks(data_bytes, chunk_size),
+                                                          label_key, mode=mode))
+            end_time = time.time()
+
+            self.write_to_json({"algorithm": f"AES_{mode.upper()}",
+                                "data_lenth": len(data),
+                                "duration": end_time - start_time,
+                                "operation_type": "encrypt_data",
+                                "key_label": label_key,
+                                "data_hash": self._data_hash(data_bytes),
+                                })
+            print(" Données chiffrées avec succès (AES)")
+            return encrypted_data.hex()
+        except Exception as e:
+            print(f" Erreur chiffrement AES: {e}")
+            return None
+
+    def decrypt_data_aes(self, encrypted_data_hex, label_key):
+        """Déchiffrer des données hexadécimales produites par `encrypt_data_aes`"""
+        try:
+            encrypted_data = bytes.fromhex(encrypted_data_hex)
+            chunk_size = int(os.environ.get("aes_chunk_size", 65536))
+
+            start_time = time.time()
+            decrypted_data = b''.join(self.decrypt_stream(_iter_chunks(encrypted_data, chunk_size),
+                                                          label_key))
+            end_time = time.time()
+
+            self.write_to_json({"algorithm": "AES",
+                                "data_lenth": len(encrypted_data_hex),
+                                "duration": end_time - start_time,
+                                "operation_type": "decrypt_data",
+                                "key_label": label_key,
+                                "data_hash": self._data_hash(encrypted_data),
+                                })
+            try:
+                return decrypted_data.decode('utf-8')
+            except UnicodeDecodeError:
+                return decrypted_data.hex()
+        except Exception as e:
+            print(f" Erreur déchiffrement AES: {e}")
+            return None
+
+    def encrypt_file(self, path_in, path_out, label_key, mode='GCM'):
+        """Chiffrer un fichier par morceaux avec une clé AES du HSM"""
+        chunk_size = int(os.environ.get("aes_chunk_size", 65536))
+        with open(path_in, 'rb') as file_in, open(path_out, 'wb') as file_out:
+            chunks = iter(lambda: file_in.read(chunk_size), b'')
+            for encrypted_chunk in self.encrypt_stream(chunks, label_key, mode=mode):
+                file_out.write(encrypted_chunk)
+
+    def decrypt_file(self, path_in, path_out, label_key):
+        """Déchiffrer un fichier produit par `encrypt_file`"""
+        chunk_size = int(os.environ.get("aes_chunk_size", 65536))
+        with open(path_in, 'rb') as file_in, open(path_out, 'wb') as file_out:
+            chunks = iter(lambda: file_in.read(chunk_size), b'')
+            for decrypted_chunk in self.decrypt_stream(chunks, label_key):
+                file_out.write(decrypted_chunk)
+
+    def generate_key_pair_with_storage(self, key_size=2048, key_type='RSA', key_label=None, curve=None):
         """Génère une paire de clés et retourne leurs métadonnées"""
         try:
             resolved_type = self._resolve_key_type(key_type)
             label = self._sanitize_label(key_label, f"{resolved_type.name.lower()}_key_{int(time.time())}")
+            if resolved_type == KeyType.AES:
+                return self._generate_secret_key_with_storage(resolved_type, key_size, label)
+            if resolved_type != KeyType.RSA:
+                # Taille de la courbe effectivement utilisée (la courbe nommée l'emporte sur key_size)
+                curve_name = self._resolve_curve(resolved_type, key_size if int(key_size) in EC_CURVES else None, curve)
+                key_size = CURVE_SIZES[curve_name]
+
             start_time = time.time()
-            public_key, private_key = self.generate_key_pair(resolved_type, key_size, label)
+            public_key, private_key = self.generate_key_pair(resolved_type, key_size, label, curve=curve)
             end_time = time.time()
 
             if public_key and private_key:
+                self.write_to_json({"algorithm": resolved_type.name,
+                                    "data_lenth": int(key_size),
+                                    "duration": end_time - start_time,
+                                    "operation_type": "generate_key",
+                                    "key_label": label,
+                                    })
                 stored_in_db = False
                 if getattr(self, 'database', None):
                     try:
@@ -405,6 +852,31 @@ class HSMManager(metaclass=SingletonMeta):
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def _generate_secret_key_with_storage(self, key_type, key_size, label):
+        start_time = time.time()
+        secret_key = self.generate_secret_key(key_type, key_size, label)
+        end_time = time.time()
+
+        if secret_key is None:
+            return {'success': False, 'error': 'Échec de la génération de la clé secrète dans le HSM'}
+
+        self.write_to_json({"algorithm": key_type.name,
+                            "data_lenth": secret_key.key_length,
+                            "duration": end_time - start_time,
+                            "operation_type": "generate_key",
+                            "key_label": label,
+                            })
+
+        return {
+            'success': True,
+            'key_id': label,
+            'key_label': label,
+            'key_type': key_type.name,
+            'key_size': secret_key.key_length,
+            'processing_time': f"{(end_time - start_time) * 1000:.2f} ms",
+            'stored_in_db': False
+        }
+
     def get_all_keys_public(self):
         if not self.session:
             self.connect()
@@ -413,7 +885,8 @@ class HSMManager(metaclass=SingletonMeta):
             pkcs11.Attribute.CLASS: pkcs11.ObjectClass.PUBLIC_KEY,
         }))
 
-        return [{"label": key.label, "key_id": key.id} for key in public_keys]
+        return [{"label": key.label, "key_id": key.id, "key_type": key.key_type.name} for key in public_keys
+                if not key.label.startswith(POOL_LABEL_PREFIX)]
 
     def get_all_keys_private(self):
         if not self.session:
@@ -422,18 +895,29 @@ class HSMManager(metaclass=SingletonMeta):
             pkcs11.Attribute.CLASS: pkcs11.ObjectClass.PRIVATE_KEY,
         }))
 
-        return [{"label": key.label, "key_id": key.id} for key in public_keys]
+        return [{"label": key.label, "key_id": key.id} for key in public_keys
+                if not key.label.startswith(POOL_LABEL_PREFIX)]
+
+    def get_all_keys_secret(self):
+        if not self.session:
+            self.connect()
+        secret_keys = list(self.session.get_objects({
+            pkcs11.Attribute.CLASS: pkcs11.ObjectClass.SECRET_KEY,
+        }))
+
+        return [{"label": key.label, "key_id": key.id} for key in secret_keys]
 
 
-    def hash_and_sign(self, data, hash_algorithm='sha256', key_label=None):
-        """Hachage + Signature avec tracking"""
+    def hash_and_sign(self, data, hash_algorithm='sha256', key_label=None, mechanism=None):
+        """Hachage + Signature avec tracking (mécanisme choisi selon le type de clé)"""
         try:
+            self.hash_manager.check_signing_algorithm(hash_algorithm)
             start_hash = time.time()
             data_hash = self.hash_manager.compute_hash(data, hash_algorithm)
             hash_time = time.time() - start_hash
 
             start_sign = time.time()
-            signature = self.sign_data(data_hash, key_label)
+            signature = self.sign_data(data_hash, key_label, mechanism=mechanism)
             sign_time = time.time() - start_sign
             data={
                     'success': True,
@@ -453,17 +937,157 @@ class HSMManager(metaclass=SingletonMeta):
             return {'success': False, 'error': str(e)}
 
 
-    def verify_hash_signature(self, data, signature, label_key,hash_algorithm,mechanism=Mechanism.RSA_PKCS):
+    def verify_hash_signature(self, data, signature, label_key,hash_algorithm,mechanism=None):
 
+        self.hash_manager.check_signing_algorithm(hash_algorithm)
         expected_hash = self.hash_manager.compute_hash(data, hash_algorithm)
-        is_valid = self.verify_signature(expected_hash, signature,label_key=label_key)  # On vérifie la signature du hash
+        is_valid = self.verify_signature(expected_hash, signature,label_key=label_key,
+                                         mechanism=mechanism)  # On vérifie la signature du hash
         return is_valid
 
 
+    def _public_key_spec(self, label_key):
+        """
+        Exporte la clé publique `label_key` sous une forme transmissible aux
+        processus de vérification (voir core.batch_verifier)
+        """
+        public_key = self.session.get_key(object_class=pkcs11.ObjectClass.PUBLIC_KEY, label=label_key)
+        spec = {'label': label_key}
+        if public_key.key_type == KeyType.RSA:
+            spec.update(type='RSA',
+                        n=int.from_bytes(public_key[pkcs11.Attribute.MODULUS], 'big'),
+                        e=int.from_bytes(public_key[pkcs11.Attribute.PUBLIC_EXPONENT], 'big'))
+        elif public_key.key_type == KeyType.EC:
+            digest = 'sha256'
+            ec_params = public_key[pkcs11.Attribute.EC_PARAMS]
+            for curve_name, curve_digest in ECDSA_DIGESTS.items():
+                if ec_params == encode_named_curve_parameters(curve_name):
+                    digest = curve_digest
+            spec.update(type='EC', der=encode_ec_public_key(public_key), digest=digest)
+        elif public_key.key_type == getattr(KeyType, 'EC_EDWARDS', None):
+            ec_point = public_key[pkcs11.Attribute.EC_POINT]
+            # EC_POINT est un OCTET STRING DER contenant la clé brute (32 ou 57 octets)
+            raw = ec_point[2:] if len(ec_point) in (34, 59) and ec_point[0] == 0x04 else ec_point
+            spec.update(type='ED25519' if len(raw) == 32 else 'ED448', raw=raw)
+        else:
+            raise ValueError(f"Type de clé non supporté pour la vérification par lot: {public_key.key_type}")
+        return spec
+
+    def verify_many(self, items, workers=None, chunk_size=1024):
+        """
+        Vérifie un grand nombre de signatures en parallèle
+
+        Les éléments sont regroupés par clé : chaque clé publique est lue une
+        seule fois dans le HSM, puis les lots sont vérifiés sur plusieurs
+        cœurs (pool partagé, voir core.process_pool). Les résultats sont
+        produits au fil de l'eau (ordre d'achèvement).
+
+        Args:
+            items (iterable): dicts {data | digest, signature, key_label, hash_algorithm}
+            workers (int): Lots en parallèle (défaut : verify_workers ; borné par la taille du pool)
+            chunk_size (int): Taille des lots envoyés à un processus
+
+        Yields:
+            dict: {'index': i, 'valid': bool, 'error'?: str}
+        """
+        if not self.session:
+            self.connect()
+        pool = ProcessPool()
+        workers = pool.clamp(workers or int(os.environ.get("verify_workers", pool.max_workers)))
+        if isinstance(items, list) and len(items) <= chunk_size:
+            workers = 1  # lot trop petit pour amortir le démarrage des processus
+        key_specs = {}
+        pending = {}  # label -> [(index, élément), ...]
+        ready = deque()  # lots prêts à soumettre : (label, [(index, élément), ...])
+        pending_total = 0
+        # Au-delà, les clés en attente partent en lots partiels (entrée répartie sur beaucoup de clés)
+        max_pending = chunk_size * 2 * workers
+        start_time = time.time()
+        total = 0
+        per_key = {}  # label -> [vérifiées, valides]
+        future_labels = {}
+
+        def spec_for(label):
+            if label not in key_specs:
+                try:
+                    self._ensure_active(label)
+                    key_specs[label] = self._public_key_spec(label)
+                except Exception as e:
+                    key_specs[label] = e
+            return key_specs[label]
+
+        executor = pool if workers > 1 else None
+        in_flight = set()
+        try:
+            exhausted = False
+            iterator = enumerate(items)
+            while not exhausted or ready or in_flight:
+                # Remplissage des lots, en gardant un nombre borné de lots en vol
+                while len(in_flight) < 2 * workers:
+                    if ready:
+                        label, chunk = ready.popleft()
+                        future = self._submit_chunk(executor, spec_for(label), chunk)
+                        future_labels[future] = label
+                        in_flight.add(future)
+                        continue
+                    if exhausted:
+                        break
+                    entry = next(iterator, None)
+                    if entry is None:
+                        exhausted = True
+                        ready.extend(pending.items())
+                        pending.clear()
+                        continue
+                    index, item = entry
+                    label = item.get('key_label')
+                    chunk = pending.setdefault(label, [])
+                    chunk.append((index, item))
+                    pending_total += 1
+                    if len(chunk) >= chunk_size:
+                        ready.append((label, pending.pop(label)))
+                        pending_total -= len(chunk)
+                    elif pending_total >= max_pending:
+                        ready.extend(pending.items())
+                        pending.clear()
+                        pending_total = 0
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts = per_key.setdefault(future_labels.pop(future), [0, 0])
+                    for result in future.result():
+                        total += 1
+                        counts[0] += 1
+                        counts[1] += result['valid']
+                        yield result
+        finally:
+            # Le pool est partagé : on annule seulement nos lots pas encore démarrés
+            for future in in_flight:
+                future.cancel()
+
+        duration = time.time() - start_time
+        # Un enregistrement par clé (index d'utilisation), durée répartie au prorata
+        for label, (count, valid) in per_key.items():
+            self.write_to_json({"algorithm": "batch",
+                                "data_lenth": count,
+                                "duration": duration * count / total,
+                                "operation_type": "verify_batch",
+                                "key_label": label,
+                                "count": count,
+                                "valid": valid
+                                })
+
+    def _submit_chunk(self, executor, key_spec, chunk):
+        """Soumet un lot à un processus (ou l'exécute sur place) et renvoie un Future"""
+        if isinstance(key_spec, Exception):
+            future = Future()
+            future.set_result([{'index': index, 'valid': False, 'error': f"Clé introuvable: {key_spec}"}
+                               for index, _ in chunk])
+            return future
+        if executor is None:
+            future = Future()
+            future.set_result(batch_verifier.verify_chunk(key_spec, chunk))
+            return future
+        return executor.submit(batch_verifier.verify_chunk, key_spec, chunk)
+
     def write_to_json(self, data):
-        with open(os.environ["data_file"], 'r+') as file:
-            file_data = json.load(file)
-            print(file_data)
-            file_data["database"]["performances"].append(data)
-            file.seek(0)
-            json.dump(file_data, file, indent=4)
+        MetricsManager().record(data)
@@ -0,0 +1,334 @@
+import fcntl
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pkcs11
+from pkcs11 import KeyType
+
+from core.hsm_manager import HSMManager, CURVE_SIZES, EC_CURVES, POOL_LABEL_PREFIX
+from utils.singleton_metaclass import SingletonMeta
+
+
+class KeyPoolManager(metaclass=SingletonMeta):
+    """
+    Réserve de paires de clés pré-générées dans le HSM
+
+    La génération RSA coûte de quelques centaines de ms à plusieurs secondes.
+    Le pool conserve N paires par (type, taille) sous un label temporaire ;
+    une demande de création réclame une paire et la renomme, puis un thread
+    d'arrière-plan regénère les clés quand le niveau du pool devient bas.
+
+    Les paires en réserve sont sur le token, partagé par tous les processus
+    (workers gunicorn) : une paire est réclamée sous un verrou de fichier, et
+    un seul processus à la fois, celui qui détient le verrou de remplissage,
+    regénère les clés. Les niveaux sont toujours lus sur le token.
+
+    Configuration (.env) :
+        key_pool_size            nombre de paires par spécification (0 = désactivé)
+        key_pool_low_watermark   niveau sous lequel le remplissage est déclenché
+        key_pool_specs           spécifications, ex: RSA:2048,EC:256
+        key_pool_lock_file       verrou inter-processus (défaut key_pool.lock à côté de data_file)
+        key_pool_check_interval  secondes entre deux contrôles du niveau (défaut 5)
+    """
+
+    def __init__(self):
+        self.hsm_manager = HSMManager()
+        self.target_size = int(os.environ.get("key_pool_size", 0))
+        self.low_watermark = int(os.environ.get("key_pool_low_watermark", max(1, self.target_size // 2)))
+        # Courbe à utiliser pour chaque spécification EC / EdDSA (None pour RSA)
+        self.spec_curves = self._parse_specs(os.environ.get("key_pool_specs", "RSA:2048"))
+        self.specs = list(self.spec_curves)
+        self.lock_file = os.environ.get("key_pool_lock_file") or os.path.join(
+            os.path.dirname(os.environ["data_file"]), "key_pool.lock")
+        self.check_interval = float(os.environ.get("key_pool_check_interval", 5))
+
+        self.lock = threading.Lock()
+        self._refill_event = threading.Event()
+        self._worker = None
+        self._session = None
+        self._refill_lock_file = None
+        self._filled_once = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'claim_time_total': 0.0,
+            'generated': 0,
+            'generation_time_total': 0.0,
+            'refills': 0,
+            'errors': 0,
+        }
+
+    def _after_fork(self):
+        """Le thread de remplissage, sa session et son verrou ne survivent pas au fork"""
+        self.lock = threading.Lock()
+        self._refill_event = threading.Event()
+        self._worker = None
+        self._session = None
+        if self._refill_lock_file is not None:
+            # Fermer la copie héritée sans LOCK_UN : le verrou reste au parent
+            self._refill_lock_file.close()
+            self._refill_lock_file = None
+        self._filled_once = False
+
+    def _parse_specs(self, raw_specs):
+        specs = {}
+        for item in raw_specs.split(','):
+            if not item.strip():
+                continue
+            key_type, _, key_size = item.partition(':')
+            resolved_type = self.hsm_manager._resolve_key_type(key_type)
+            spec, curve_name = self._spec(resolved_type, key_size or None)
+            specs[spec] = curve_name
+        return specs
+
+    def _spec(self, resolved_type, key_size=None, curve=None):
+        """
+        Spécification (type, taille) d'une demande, avec la taille effective
+        de la courbe pour EC / EdDSA (même règle que generate_key_pair_with_storage)
+
+        Returns:
+            tuple: ((type, taille), courbe ou None)
+        """
+        if resolved_type == KeyType.RSA:
+            return (resolved_type.name, int(key_size or 2048)), None
+        size = int(key_size) if key_size else None
+        curve_name = self.hsm_manager._resolve_curve(resolved_type, size if size in EC_CURVES else None, curve)
+        return (resolved_type.name, CURVE_SIZES[curve_name]), curve_name
+
+    def _pool_label(self, spec):
+        key_type, key_size = spec
+        return f"{POOL_LABEL_PREFIX}{key_type.lower()}_{key_size}_{uuid.uuid4().hex[:12]}"
+
+    @property
+    def enabled(self):
+        return self.target_size > 0 and bool(self.specs)
+
+    @contextmanager
+    def _claim_lock(self):
+        """Verrou inter-processus : une paire du pool n'est réclamée qu'une fois"""
+        with open(self.lock_file, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _pool_labels(self, session):
+        """Labels des paires en réserve sur le token, par spécification"""
+        labels = {spec: [] for spec in self.specs}
+        private_keys = session.get_objects({
+            pkcs11.Attribute.CLASS: pkcs11.ObjectClass.PRIVATE_KEY,
+        })
+        for key in private_keys:
+            label = key.label
+            if not label.startswith(POOL_LABEL_PREFIX):
+                continue
+            try:
+                key_type, key_size, _ = label[len(POOL_LABEL_PREFIX):].rsplit('_', 2)
+                spec = (key_type.upper(), int(key_size))
+            except ValueError:
+                continue
+            if spec in labels:
+                labels[spec].append(label)
+        return labels
+
+    def start(self):
+        """Démarre le thread de remplissage (actif dans un seul processus à la fois)"""
+        if not self.enabled or self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._refill_loop, name="key-pool-refill", daemon=True)
+        self._worker.start()
+        self._refill_event.set()
+        print(f"Pool de clés démarré : {self.target_size} paire(s) par spécification {self.specs}")
+
+    def _acquire_refill_role(self):
+        """
+        Verrou de remplissage, non bloquant et gardé jusqu'à la fin du processus
+
+        Si le processus qui remplit le pool s'arrête, le système libère le
+        verrou et un autre processus le reprend au contrôle suivant.
+        """
+        if self._refill_lock_file is not None:
+            return True
+        lock_file = open(self.lock_file + ".refill", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._refill_lock_file = lock_file
+        return True
+
+    def _refill_loop(self):
+        while True:
+            self._refill_event.wait(self.check_interval)
+            self._refill_event.clear()
+            if not self._acquire_refill_role():
+                continue  # un autre processus remplit le pool
+            try:
+                self._refill()
+            except Exception as e:
+                with self.lock:
+                    self.metrics['errors'] += 1
+                print(f"Erreur remplissage du pool de clés: {e}")
+                time.sleep(1)
+                self._refill_event.set()
+
+    def _refill(self):
+        """Complète jusqu'à key_pool_size les spécifications passées sous le seuil bas"""
+        if self._session is None:
+            # Session dédiée : la session principale reste libre pour les requêtes
+            self._session = self.hsm_manager.open_session()
+        levels = self._pool_labels(self._session)
+        # Au premier passage, le pool est complété même au-dessus du seuil bas
+        to_fill = {spec: self.target_size - len(labels) for spec, labels in levels.items()
+                   if len(labels) < (self.target_size if not self._filled_once else self.low_watermark)}
+        if to_fill:
+            with self.lock:
+                self.metrics['refills'] += 1
+        for spec, missing in to_fill.items():
+            key_type, key_size = spec
+            for _ in range(missing):
+                label = self._pool_label(spec)
+                start_time = time.time()
+                public_key, private_key = self.hsm_manager.generate_key_pair(
+                    key_type, key_size, label, curve=self.spec_curves.get(spec), session=self._session
+                )
+                if public_key is None:
+                    raise RuntimeError(f"échec de génération pour {spec}")
+                with self.lock:
+                    self.metrics['generated'] += 1
+                    self.metrics['generation_time_total'] += time.time() - start_time
+        self._filled_once = True
+
+    def claim(self, key_type, key_size, key_label, curve=None):
+        """
+        Réclame une paire du pool et lui attribue le label définitif
+
+        Returns:
+            tuple: (clé_publique, clé_privée) ou (None, None) si le pool est vide
+        """
+        spec, _ = self._spec(self.hsm_manager._resolve_key_type(key_type), key_size, curve)
+        if not self.enabled or spec not in self.specs:
+            return None, None
+
+        start_time = time.time()
+        keys = (None, None)
+        with self._claim_lock():
+            # Niveau relu sur le token : les autres processus ont pu réclamer des paires
+            available = self._pool_labels(self.hsm_manager.session)[spec]
+            while available:
+                keys = self._relabel(available.pop(), key_label)
+                if keys is not None:
+                    break
+            else:
+                keys = (None, None)
+
+        with self.lock:
+            if keys[0] is not None:
+                self.metrics['hits'] += 1
+                self.metrics['claim_time_total'] += time.time() - start_time
+            else:
+                self.metrics['misses'] += 1
+
+        if len(available) < self.low_watermark:
+            self._refill_event.set()
+        return keys
+
+    def _relabel(self, pool_label, key_label):
+        """Renomme les deux moitiés de la paire ; annule si l'une échoue"""
+        session = self.hsm_manager.session
+        try:
+            public_key = session.get_key(object_class=pkcs11.ObjectClass.PUBLIC_KEY, label=pool_label)
+            private_key = session.get_key(object_class=pkcs11.ObjectClass.PRIVATE_KEY, label=pool_label)
+        except Exception as e:
+            print(f"Clé de pool introuvable ({pool_label}): {e}")
+            return None
+
+        private_key[pkcs11.Attribute.LABEL] = key_label
+        try:
+            public_key[pkcs11.Attribute.LABEL] = key_label
+        except Exception:
+            private_key[pkcs11.Attribute.LABEL] = pool_label
+            raise
+        return public_key, private_key
+
+    def generate_key_pair_with_storage(self, key_size=2048, key_type='RSA', key_label=None, curve=None):
+        """
+        Même contrat que HSMManager.generate_key_pair_with_storage, en servant
+        la demande depuis le pool quand une paire est disponible
+        """
+        resolved_type = self.hsm_manager._resolve_key_type(key_type)
+        if not self.enabled or resolved_type == KeyType.AES:
+            return self.hsm_manager.generate_key_pair_with_storage(key_size, key_type, key_label, curve=curve)
+
+        try:
+            if not self.hsm_manager.session:
+                self.hsm_manager.connect()
+            label = self.hsm_manager._sanitize_label(key_label, f"{resolved_type.name.lower()}_key_{int(time.time())}")
+            # Taille de la courbe pour EC / EdDSA (le formulaire envoie 2048 par défaut)
+            (_, key_size), _ = self._spec(resolved_type, key_size, curve)
+            start_time = time.time()
+            public_key, private_key = self.claim(resolved_type, key_size, label, curve=curve)
+            end_time = time.time()
+        except Exception as e:
+            print(f"Erreur pool de clés, génération directe: {e}")
+            public_key = None
+
+        if public_key is None:
+            return self.hsm_manager.generate_key_pair_with_storage(key_size, key_type, key_label, curve=curve)
+
+        self.hsm_manager.write_to_json({"algorithm": resolved_type.name,
+                                        "data_lenth": int(key_size),
+                                        "duration": end_time - start_time,
+                                        "operation_type": "generate_key",
+                                        "key_label": label,
+                                        "from_pool": True,
+                                        })
+        return {
+            'success': True,
+            'key_id': label,
+            'key_label': label,
+            'key_type': resolved_type.name,
+            'key_size': int(key_size),
+            'processing_time': f"{(end_time - start_time) * 1000:.2f} ms",
+            'stored_in_db': False,
+            'from_pool': True
+        }
+
+    def get_statistics(self):
+        """Niveaux du pool (lus sur le token) et métriques de service de ce processus"""
+        levels = {}
+        if self.enabled:
+            try:
+                if not self.hsm_manager.session:
+                    self.hsm_manager.connect()
+                levels = {f"{key_type}:{key_size}": len(labels)
+                          for (key_type, key_size), labels in self._pool_labels(self.hsm_manager.session).items()}
+            except Exception as e:
+                print(f"Erreur lecture des niveaux du pool de clés: {e}")
+        with self.lock:
+            metrics = dict(self.metrics)
+
+        claims = metrics['hits'] + metrics['misses']
+        return {
+            'enabled': self.enabled,
+            'target_size': self.target_size,
+            'low_watermark': self.low_watermark,
+            'levels': levels,
+            'refill_process': self._refill_lock_file is not None,
+            'hits': metrics['hits'],
+            'misses': metrics['misses'],
+            'hit_rate': metrics['hits'] / claims if claims else 0,
+            'avg_claim_ms': metrics['claim_time_total'] / metrics['hits'] * 1000 if metrics['hits'] else 0,
+            'generated': metrics['generated'],
+            'avg_generation_ms': (metrics['generation_time_total'] / metrics['generated'] * 1000
+                                  if metrics['generated'] else 0),
+            'refills': metrics['refills'],
+            'errors': metrics['errors'],
+        }
@@ -0,0 +1,402 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from core.export_manager import iter_performance_records, iter_shard_records
+from core.metrics_manager import MetricsManager
+from utils.singleton_metaclass import SingletonMeta
+
+# operation_type des enregistrements -> type attendu par keys_management.js
+OPERATION_TYPES = {
+    'sign_data': 'signature',
+    'verify_signature': 'verification',
+    'verify_batch': 'batch_verification',
+    'encrypt_data': 'encryption',
+    'decrypt_data': 'decryption',
+    'generate_key': 'key_generation',
+    'hash_and_sign': 'hash_and_sign',
+}
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class KeyUsage:
+    """Compteurs d'une clé, mis à jour en O(1) à chaque opération"""
+
+    def __init__(self, recent_size):
+        self.count = 0
+        self.failures = 0
+        self.total_duration = 0.0
+        self.min_duration = None
+        self.max_duration = None
+        self.last_used = None
+        self.by_operation = {}
+        self.recent = deque(maxlen=recent_size)
+
+    def add(self, data):
+        # `count` : opérations regroupées dans un enregistrement (vérification par lot)
+        count = data.get("count", 1)
+        duration = data.get("duration", 0.0)
+        self.count += count
+        if not data.get("success", True):
+            self.failures += count
+        self.total_duration += duration
+        per_operation = duration / count
+        self.min_duration = per_operation if self.min_duration is None else min(self.min_duration, per_operation)
+        self.max_duration = per_operation if self.max_duration is None else max(self.max_duration, per_operation)
+        timestamp = data.get("timestamp")
+        if timestamp is not None and (self.last_used is None or timestamp > self.last_used):
+            self.last_used = timestamp
+        operation_type = data.get("operation_type", "unknown")
+        self.by_operation[operation_type] = self.by_operation.get(operation_type, 0) + count
+        self.recent.append(data)
+
+    def add_aggregate(self, aggregate):
+        """Compteurs d'enregistrements compactés (voir metrics_manager.fold_key_usage)"""
+        if not aggregate.get("count"):
+            return
+        self.count += aggregate["count"]
+        self.failures += aggregate.get("failures", 0)
+        self.total_duration += aggregate.get("total_duration", 0.0)
+        for name, pick in (("min_duration", min), ("max_duration", max)):
+            value = aggregate.get(name)
+            if value is not None:
+                current = getattr(self, name)
+                setattr(self, name, value if current is None else pick(current, value))
+        last_used = aggregate.get("last_used")
+        if last_used is not None and (self.last_used is None or last_used > self.last_used):
+            self.last_used = last_used
+        for operation_type, count in aggregate.get("by_operation", {}).items():
+            self.by_operation[operation_type] = self.by_operation.get(operation_type, 0) + count
+
+    def to_state(self):
+        """État sérialisable (format de metrics_manager.fold_key_usage, plus `recent`)"""
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "total_duration": self.total_duration,
+            "min_duration": self.min_duration,
+            "max_duration": self.max_duration,
+            "last_used": self.last_used,
+            "by_operation": dict(self.by_operation),
+            "recent": list(self.recent),
+        }
+
+    def merge(self, state):
+        """Ajoute un état (`to_state`) ; les opérations récentes restent triées par date"""
+        self.add_aggregate(state)
+        recent = sorted(list(self.recent) + state.get("recent", []), key=lambda item: item.get("timestamp") or 0)
+        self.recent.clear()
+        self.recent.extend(recent)
+
+    def to_dict(self):
+        return {
+            'usage_count': self.count,
+            'failures': self.failures,
+            'avg_ms': self.total_duration / self.count * 1000 if self.count else 0,
+            'min_ms': (self.min_duration or 0) * 1000,
+            'max_ms': (self.max_duration or 0) * 1000,
+            'last_used': _iso(self.last_used),
+            'by_operation': dict(self.by_operation),
+        }
+
+
+class KeyUsageIndex(metaclass=SingletonMeta):
+    """
+    Index d'utilisation par clé (nombre d'opérations, latences, dernière utilisation)
+
+    Construit une fois à partir de l'historique, puis tenu à jour par
+    MetricsManager à chaque enregistrement portant un `key_label`. Le statut
+    actif/inactif des clés est stocké dans `key_status_file` et relu lorsque
+    le fichier change (partagé entre les workers).
+
+    Mode multi-processus (`metrics_shard_dir`) : chaque worker ne voit passer
+    que ses propres enregistrements. L'index commun est alors `key-usage.json`
+    dans le répertoire des fragments : construit une fois à partir de
+    l'historique, chaque worker y ajoute ses opérations (au plus une fois par
+    seconde, sous verrou) et le relit s'il a changé, au plus une fois par
+    `key_usage_refresh_interval` secondes (ses propres opérations sont visibles
+    immédiatement).
+
+    Configuration (.env) :
+        key_usage_recent            opérations récentes conservées par clé (défaut 50)
+        key_status_file             fichier des statuts (défaut key_status.json à côté de data_file)
+        key_usage_refresh_interval  secondes entre deux relectures de l'index commun (défaut 5)
+    """
+
+    def __init__(self):
+        self.recent_size = int(os.environ.get("key_usage_recent", 50))
+        self.status_file = os.environ.get("key_status_file") or os.path.join(
+            os.path.dirname(os.environ["data_file"]), "key_status.json")
+        self.lock = threading.Lock()
+        self.keys = {}
+        self._statuses = {}
+        self._status_mtime = None
+
+        metrics = MetricsManager()
+        self.shared_file = os.path.join(metrics.shard_dir, "key-usage.json") if metrics.shard_dir else None
+        self._pending = {}   # label -> KeyUsage pas encore ajouté à l'état commun
+        self._flushing = {}  # en cours d'écriture dans l'état commun
+        self._shared_version = None
+        self.refresh_interval = float(os.environ.get("key_usage_refresh_interval", 5))
+        self._last_refresh = None
+        self._flush_timer = None
+        if self.shared_file:
+            self._load_shared(metrics)
+            atexit.register(self.flush)
+        else:
+            self._load_history(metrics)
+        metrics.add_listener(self.add)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.lock = threading.Lock()
+        # Les opérations en attente du parent restent à la charge du parent
+        self._pending = {}
+        self._flushing = {}
+        self._flush_timer = None
+
+    def _load_history(self, metrics):
+        try:
+            # Compteurs des enregistrements déjà compactés, puis enregistrements détaillés
+            for label, aggregate in metrics.compacted_key_usage().items():
+                with self.lock:
+                    usage = self.keys.get(label)
+                    if usage is None:
+                        usage = self.keys[label] = KeyUsage(self.recent_size)
+                    usage.add_aggregate(aggregate)
+            records = iter_performance_records(metrics.data_file)
+            for record in records:
+                self._index(record)
+            for record in iter_shard_records(metrics.shard_dir):
+                self._index(record)
+        except Exception as e:
+            print(f"Erreur construction de l'index d'utilisation des clés: {e}")
+
+    def _index(self, data):
+        label = data.get("key_label")
+        if not label:
+            return
+        with self.lock:
+            usage = self.keys.get(label)
+            if usage is None:
+                usage = self.keys[label] = KeyUsage(self.recent_size)
+            usage.add(data)
+
+    def add(self, data):
+        """Listener de MetricsManager : opération enregistrée par ce processus"""
+        label = data.get("key_label")
+        if not label:
+            return
+        self._index(data)
+        if self.shared_file:
+            with self.lock:
+                pending = self._pending.get(label)
+                if pending is None:
+                    pending = self._pending[label] = KeyUsage(self.recent_size)
+                pending.add(data)
+            self._schedule_flush()
+
+    # ======== ÉTAT COMMUN (MODE MULTI-PROCESSUS) =========
+
+    @contextmanager
+    def _shared_lock(self):
+        with open(self.shared_file + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_shared(self):
+        try:
+            with open(self.shared_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_shared(self, state):
+        tmp_path = self.shared_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.shared_file)
+
+    def _load_shared(self, metrics):
+        """Le premier worker construit l'état commun à partir de l'historique"""
+        with self._shared_lock():
+            if not os.path.exists(self.shared_file):
+                self._load_history(metrics)
+                with self.lock:
+                    state = {label: usage.to_state() for label, usage in self.keys.items()}
+                self._write_shared(state)
+        self._refresh_shared()
+
+    def _refresh_shared(self):
+        """Relit l'état commun s'il a changé, puis réapplique les opérations locales en attente"""
+        if not self.shared_file:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return
+            self._last_refresh = now
+        try:
+            stat = os.stat(self.shared_file)
+        except FileNotFoundError:
+            return
+        version = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        with self.lock:
+            if version == self._shared_version:
+                return
+        try:
+            state = self._read_shared()
+        except ValueError as e:
+            print(f"Erreur lecture de l'index commun d'utilisation des clés: {e}")
+            return
+        keys = {}
+        for label, entry in state.items():
+            keys[label] = KeyUsage(self.recent_size)
+            keys[label].merge(entry)
+        with self.lock:
+            for local in (self._flushing, self._pending):
+                for label, usage in local.items():
+                    keys.setdefault(label, KeyUsage(self.recent_size)).merge(usage.to_state())
+            self.keys = keys
+            self._shared_version = version
+
+    def _schedule_flush(self, delay=1.0):
+        """Ajoute les opérations locales à l'état commun au plus une fois par `delay` secondes"""
+        with self.lock:
+            if self._flush_timer is not None:
+                return
+            self._flush_timer = threading.Timer(delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Ajoute les opérations de ce processus à l'état commun"""
+        if not self.shared_file:
+            return
+        with self.lock:
+            self._flush_timer = None
+            self._flushing, self._pending = self._pending, {}
+            flushing = self._flushing
+        if not flushing:
+            return
+        try:
+            with self._shared_lock():
+                state = self._read_shared()
+                for label, usage in flushing.items():
+                    merged = KeyUsage(self.recent_size)
+                    merged.merge(state.get(label, {}))
+                    merged.merge(usage.to_state())
+                    state[label] = merged.to_state()
+                self._write_shared(state)
+        except Exception as e:
+            print(f"Erreur écriture de l'index commun d'utilisation des clés: {e}")
+            with self.lock:
+                # Nouvel essai au prochain enregistrement
+                for label, usage in flushing.items():
+                    self._pending.setdefault(label, KeyUsage(self.recent_size)).merge(usage.to_state())
+        with self.lock:
+            self._flushing = {}
+
+    # ======== CONSULTATION =========
+
+    def usage(self, label):
+        """Statistiques d'une clé (compteurs à zéro si jamais utilisée)"""
+        self._refresh_shared()
+        with self.lock:
+            usage = self.keys.get(label)
+            stats = usage.to_dict() if usage else KeyUsage(0).to_dict()
+        stats['status'] = self.status(label)
+        return stats
+
+    def operations(self, label, limit=None):
+        """Dernières opérations de la clé, de la plus récente à la plus ancienne"""
+        self._refresh_shared()
+        with self.lock:
+            usage = self.keys.get(label)
+            recent = list(usage.recent) if usage else []
+        recent.reverse()
+        if limit:
+            recent = recent[:limit]
+        return [{
+            'operation_type': OPERATION_TYPES.get(item.get("operation_type"), item.get("operation_type")),
+            'algorithm': str(item.get("algorithm", "N/A")),
+            'data_hash': item.get("data_hash"),
+            'signature_preview': item.get("signature_preview"),
+            'processing_time': f"{item.get('duration', 0) * 1000:.2f} ms",
+            'timestamp': _iso(item.get("timestamp")),
+            'success': item.get("success", True),
+        } for item in recent]
+
+    def hot_keys(self, limit=10):
+        """Clés les plus utilisées (planification de capacité)"""
+        self._refresh_shared()
+        with self.lock:
+            ranking = sorted(self.keys.items(), key=lambda entry: entry[1].count, reverse=True)[:limit]
+            return [dict(usage.to_dict(), label=label) for label, usage in ranking]
+
+    def summary(self):
+        """Statistiques globales pour la page de gestion des clés"""
+        self._refresh_shared()
+        with self.lock:
+            total_operations = sum(usage.count for usage in self.keys.values())
+            failures = sum(usage.failures for usage in self.keys.values())
+            total_duration = sum(usage.total_duration for usage in self.keys.values())
+        return {
+            'total_operations': total_operations,
+            'success_rate': f"{(1 - failures / total_operations) * 100:.1f}%" if total_operations else "N/A",
+            'avg_processing_time': f"{total_duration / total_operations * 1000:.2f} ms" if total_operations else "N/A",
+        }
+
+    # ======== STATUT DES CLÉS =========
+
+    def _refresh_statuses(self):
+        try:
+            mtime = os.stat(self.status_file).st_mtime_ns
+        except FileNotFoundError:
+            self._statuses, self._status_mtime = {}, None
+            return
+        if mtime != self._status_mtime:
+            with open(self.status_file, "r") as f:
+                self._statuses = json.load(f)
+            self._status_mtime = mtime
+
+    def status(self, label):
+        self._refresh_statuses()
+        return self._statuses.get(label, "active")
+
+    def is_active(self, label):
+        return self.status(label) == "active"
+
+    def set_status(self, label, status):
+        if status not in ("active", "inactive"):
+            raise ValueError(f"Statut invalide: {status}")
+        with self.lock:
+            self._refresh_statuses()
+            statuses = dict(self._statuses)
+            if status == "active":
+                statuses.pop(label, None)
+            else:
+                statuses[label] = status
+            tmp_path = self.status_file + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(statuses, f, indent=4)
+            os.replace(tmp_path, self.status_file)
+            self._statuses = statuses
+            self._status_mtime = os.stat(self.status_file).st_mtime_ns
+        return status
+
+    def toggle_status(self, label):
+        """Active une clé inactive et inversement ; renvoie le nouveau statut"""
+        return self.set_status(label, "inactive" if self.is_active(label) else "active")
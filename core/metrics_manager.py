@@ -0,0 +1,490 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from core.latency_sketch import LatencySketch
+from utils.singleton_metaclass import SingletonMeta
+
+
+def size_bucket(data_length):
+    """Classe de taille (puissance de 2 supérieure) d'une donnée"""
+    return 1 << max(0, int(data_length or 0) - 1).bit_length()
+
+
+def fold_key_usage(aggregate, item):
+    """
+    Ajoute un enregistrement aux compteurs d'une clé conservés par la compaction
+
+    `aggregate` : {count, failures, total_duration, min_duration, max_duration,
+    last_used, by_operation}, relu par KeyUsageIndex au démarrage
+    """
+    count = item.get("count", 1)
+    duration = item.get("duration", 0.0)
+    per_operation = duration / count
+    aggregate["count"] = aggregate.get("count", 0) + count
+    aggregate["failures"] = aggregate.get("failures", 0) + (0 if item.get("success", True) else count)
+    aggregate["total_duration"] = aggregate.get("total_duration", 0.0) + duration
+    aggregate["min_duration"] = min(aggregate.get("min_duration", per_operation), per_operation)
+    aggregate["max_duration"] = max(aggregate.get("max_duration", per_operation), per_operation)
+    timestamp = item.get("timestamp")
+    if timestamp is not None and timestamp > (aggregate.get("last_used") or 0):
+        aggregate["last_used"] = timestamp
+    by_operation = aggregate.setdefault("by_operation", {})
+    operation_type = item.get("operation_type", "unknown")
+    by_operation[operation_type] = by_operation.get(operation_type, 0) + count
+    return aggregate
+
+
+class RollupRing:
+    """
+    Tampon circulaire d'agrégats temporels à résolution fixe
+
+    Chaque case couvre `resolution` secondes et contient, pour chaque couple
+    (opération, algorithme), les valeurs [count, sum, min, max] des durées.
+    Une case est réutilisée quand le temps a fait le tour du tampon.
+    """
+
+    def __init__(self, resolution, capacity):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.slots = [None] * capacity  # (numéro de case, {clé: [count, sum, min, max]})
+
+    @property
+    def span(self):
+        return self.resolution * self.capacity
+
+    def add(self, timestamp, key, duration):
+        bucket_id = int(timestamp // self.resolution)
+        index = bucket_id % self.capacity
+        slot = self.slots[index]
+        if slot is None or slot[0] != bucket_id:
+            if slot is not None and slot[0] > bucket_id:
+                return  # échantillon plus ancien que la fenêtre conservée
+            slot = (bucket_id, {})
+            self.slots[index] = slot
+        stats = slot[1].get(key)
+        if stats is None:
+            slot[1][key] = [1, duration, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = min(stats[2], duration)
+            stats[3] = max(stats[3], duration)
+
+    def buckets(self, since, until):
+        """Parcourt les cases non vides comprises entre `since` et `until`"""
+        first = int(since // self.resolution)
+        last = int(until // self.resolution)
+        first = max(first, last - self.capacity + 1)
+        for bucket_id in range(first, last + 1):
+            slot = self.slots[bucket_id % self.capacity]
+            if slot is not None and slot[0] == bucket_id:
+                yield bucket_id * self.resolution, slot[1]
+
+    def to_dict(self):
+        return {
+            'resolution': self.resolution,
+            'capacity': self.capacity,
+            'slots': [
+                [slot[0], [[op, algo] + stats for (op, algo), stats in slot[1].items()]]
+                for slot in self.slots if slot is not None
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        ring = cls(data['resolution'], data['capacity'])
+        for bucket_id, entries in data['slots']:
+            ring.slots[bucket_id % ring.capacity] = (
+                bucket_id, {(op, algo): stats for op, algo, *stats in entries}
+            )
+        return ring
+
+
+class MetricsManager(metaclass=SingletonMeta):
+    """
+    Enregistrement des mesures de performance
+
+    Chaque enregistrement est horodaté puis ajouté à `performances` dans le
+    fichier de données. Il alimente aussi des agrégats en mémoire par seconde,
+    minute et heure, pour interroger les dernières minutes / heures en
+    O(cases) au lieu de relire tout l'historique.
+
+    Les enregistrements plus vieux que `metrics_retention_seconds` sont
+    compactés dans des sketches de latence (`sketches`) par (opération,
+    algorithme, classe de taille), ce qui borne la taille du fichier. Les
+    compteurs par clé (`key_usage`) sont conservés pour KeyUsageIndex.
+
+    Mode multi-processus (`metrics_shard_dir` défini, ex: gunicorn) : chaque
+    processus ajoute ses enregistrements à son propre fichier JSONL
+    (`metrics-<pid>.jsonl`) sans réécrire le fichier de données, et publie
+    ses agrégats dans `rollup-<pid>.json`. `merge_shards` (appelé par
+    AnalysisManager) intègre les fragments au fichier de données sous verrou.
+    """
+
+    def __init__(self):
+        self.data_file = os.environ["data_file"]
+        self.retention = float(os.environ.get("metrics_retention_seconds", 7 * 24 * 3600))
+        self.compaction_interval = int(os.environ.get("metrics_compaction_interval", 1000))
+        self.shard_dir = os.environ.get("metrics_shard_dir") or None
+        self._records_since_compaction = 0
+        self.lock = threading.Lock()
+        self.rings = self._new_rings()
+        self._shard_file = None
+        self._last_publish = 0
+        self._publish_timer = None
+        self.listeners = []
+        if self.shard_dir:
+            os.makedirs(self.shard_dir, exist_ok=True)
+        else:
+            # En mode fragmenté, l'historique est porté par les agrégats publiés
+            self._load_history()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _new_rings(self):
+        return [
+            RollupRing(1, 3600),        # 1 h à la seconde
+            RollupRing(60, 24 * 60),    # 24 h à la minute
+            RollupRing(3600, 24 * 30),  # 30 jours à l'heure
+        ]
+
+    def _after_fork(self):
+        """Dans un processus fils : verrous, fichier de fragment et agrégats propres"""
+        self.lock = threading.Lock()
+        self._shard_file = None
+        self._publish_timer = None
+        if self.shard_dir:
+            # Les agrégats du parent sont déjà publiés sous son pid
+            self.rings = self._new_rings()
+
+    @contextmanager
+    def _data_file_lock(self):
+        """Verrou inter-processus sur le fichier de données"""
+        with open(self.data_file + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_data_file(self):
+        with open(self.data_file, "r") as f:
+            return json.load(f)
+
+    def _write_data_file(self, file_data):
+        """
+        Remplace le fichier de données d'un bloc (fichier temporaire puis
+        os.replace) : un lecteur sans verrou voit l'ancienne ou la nouvelle
+        version, jamais un fichier en cours de réécriture. Appelé sous
+        `_data_file_lock`.
+        """
+        tmp_path = self.data_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(file_data, f, indent=4)
+        os.replace(tmp_path, self.data_file)
+
+    def add_listener(self, callback):
+        """`callback(data)` est appelé après chaque enregistrement (index incrémentaux)"""
+        self.listeners.append(callback)
+
+    def _key(self, data):
+        return data.get("operation_type", "unknown"), str(data.get("algorithm", "N/A"))
+
+    def _load_history(self):
+        """Alimente les agrégats avec les enregistrements horodatés existants"""
+        try:
+            with open(self.data_file, "r") as f:
+                performances = json.load(f)["database"]["performances"]
+        except Exception as e:
+            print(f"Erreur lecture historique des performances: {e}")
+            return
+        oldest = time.time() - self.rings[-1].span
+        for item in performances:
+            timestamp = item.get("timestamp")
+            if timestamp is not None and timestamp >= oldest:
+                self._add_to_rollups(item)
+
+    def _add_to_rollups(self, data):
+        key = self._key(data)
+        for ring in self.rings:
+            ring.add(data["timestamp"], key, data["duration"])
+
+    def record(self, data):
+        """Horodate un enregistrement, le persiste et met à jour les agrégats"""
+        data = dict(data)
+        data.setdefault("timestamp", time.time())
+        with self.lock:
+            if self.shard_dir:
+                self._append_to_shard(data)
+            else:
+                with self._data_file_lock():
+                    file_data = self._read_data_file()
+                    file_data["database"]["performances"].append(data)
+                    self._write_data_file(file_data)
+            self._add_to_rollups(data)
+            self._records_since_compaction += 1
+            compact = self._records_since_compaction >= self.compaction_interval
+
+        for callback in self.listeners:
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"Erreur mise à jour d'un index de métriques: {e}")
+        if self.shard_dir:
+            self._schedule_publish()
+        if compact:
+            if self.shard_dir:
+                self.merge_shards()
+            self.compact()
+        return data
+
+    # ======== MODE MULTI-PROCESSUS =========
+
+    def _shard_path(self, prefix, extension):
+        return os.path.join(self.shard_dir, f"{prefix}-{os.getpid()}.{extension}")
+
+    def _append_to_shard(self, data):
+        """
+        Ajoute une ligne au fragment du processus courant
+
+        Seul ce processus écrit dans son fragment ; le verrou de fichier n'est
+        disputé que par `merge_shards`, qui renomme le fragment avant de le
+        lire : si le fichier ouvert n'est plus celui du chemin, on le rouvre.
+        """
+        path = self._shard_path("metrics", "jsonl")
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        while True:
+            if self._shard_file is None:
+                self._shard_file = open(path, "ab")
+            fcntl.flock(self._shard_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    current_inode = os.stat(path).st_ino
+                except FileNotFoundError:
+                    current_inode = None
+                if current_inode == os.fstat(self._shard_file.fileno()).st_ino:
+                    self._shard_file.write(line)
+                    self._shard_file.flush()
+                    return
+            finally:
+                fcntl.flock(self._shard_file, fcntl.LOCK_UN)
+            # Fragment renommé par la fusion : on repart sur un nouveau fichier
+            self._shard_file.close()
+            self._shard_file = None
+
+    def _schedule_publish(self, delay=1.0):
+        """Publie les agrégats au plus une fois par `delay` secondes"""
+        with self.lock:
+            if self._publish_timer is not None:
+                return
+            wait = max(0.0, self._last_publish + delay - time.time())
+            self._publish_timer = threading.Timer(wait, self._publish_rollups)
+            self._publish_timer.daemon = True
+            self._publish_timer.start()
+
+    def _publish_rollups(self):
+        with self.lock:
+            self._publish_timer = None
+            self._last_publish = time.time()
+            snapshot = [ring.to_dict() for ring in self.rings]
+        path = self._shard_path("rollup", "json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def _published_rings(self, resolution):
+        """Agrégats publiés par les autres processus, à la résolution demandée"""
+        if not self.shard_dir:
+            return []
+        own = os.path.basename(self._shard_path("rollup", "json"))
+        rings = []
+        for name in os.listdir(self.shard_dir):
+            if not name.startswith("rollup-") or not name.endswith(".json") or name == own:
+                continue
+            try:
+                with open(os.path.join(self.shard_dir, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for ring_data in snapshot:
+                if ring_data['resolution'] == resolution:
+                    rings.append(RollupRing.from_dict(ring_data))
+        return rings
+
+    def merge_shards(self):
+        """
+        Intègre les fragments de tous les processus au fichier de données
+
+        Returns:
+            int: Nombre d'enregistrements intégrés
+        """
+        if not self.shard_dir:
+            return 0
+        with self._data_file_lock():
+            records = []
+            merged_paths = []
+            for name in sorted(os.listdir(self.shard_dir)):
+                path = os.path.join(self.shard_dir, name)
+                if name.startswith("metrics-") and name.endswith(".jsonl"):
+                    merging_path = path + ".merging"
+                    os.replace(path, merging_path)
+                elif name.startswith("metrics-") and name.endswith(".jsonl.merging"):
+                    merging_path = path  # reste d'une fusion interrompue
+                else:
+                    continue
+                with open(merging_path, "rb") as shard:
+                    # Attend la fin d'une écriture commencée avant le renommage
+                    fcntl.flock(shard, fcntl.LOCK_EX)
+                    for line in shard:
+                        if line.strip():
+                            records.append(json.loads(line))
+                merged_paths.append(merging_path)
+
+            if records:
+                file_data = self._read_data_file()
+                file_data["database"]["performances"].extend(records)
+                self._write_data_file(file_data)
+            for merging_path in merged_paths:
+                os.remove(merging_path)
+            self._prune_rollups()
+        return len(records)
+
+    def _prune_rollups(self):
+        """Supprime les agrégats publiés par des processus arrêtés depuis plus de 30 jours"""
+        oldest = time.time() - self.rings[-1].span
+        for name in os.listdir(self.shard_dir):
+            path = os.path.join(self.shard_dir, name)
+            if name.startswith("rollup-") and os.path.getmtime(path) < oldest:
+                os.remove(path)
+
+    def compact(self, retention=None):
+        """
+        Replie les enregistrements plus anciens que la rétention dans les sketches
+
+        Les enregistrements sans horodatage (antérieurs à l'horodatage) sont
+        considérés comme anciens.
+
+        Returns:
+            int: Nombre d'enregistrements compactés
+        """
+        retention = self.retention if retention is None else retention
+        cutoff = time.time() - retention
+        with self.lock:
+            self._records_since_compaction = 0
+        with self._data_file_lock():
+            file_data = self._read_data_file()
+            database = file_data["database"]
+            kept = []
+            old = []
+            for item in database["performances"]:
+                if item.get("timestamp", 0) < cutoff:
+                    old.append(item)
+                else:
+                    kept.append(item)
+            if not old:
+                return 0
+
+            sketches = {}
+            for entry in database.get("sketches", []):
+                key = (entry["operation_type"], entry.get("algorithm"), entry["size_bucket"])
+                sketches[key] = (entry, LatencySketch.from_dict(entry["sketch"]))
+            for item in old:
+                key = (item.get("operation_type", "unknown"), item.get("algorithm"),
+                       size_bucket(item.get("data_lenth")))
+                if key not in sketches:
+                    entry = {"operation_type": key[0], "size_bucket": key[2]}
+                    if key[1] is not None:
+                        entry["algorithm"] = key[1]
+                    sketches[key] = (entry, LatencySketch())
+                sketches[key][1].add(item["duration"])
+                if item.get("key_label"):
+                    key_usage = database.setdefault("key_usage", {})
+                    fold_key_usage(key_usage.setdefault(item["key_label"], {}), item)
+
+            database["sketches"] = []
+            for entry, sketch in sketches.values():
+                entry["sketch"] = sketch.to_dict()
+                database["sketches"].append(entry)
+            database["performances"] = kept
+            self._write_data_file(file_data)
+        print(f"{len(old)} enregistrement(s) compacté(s) dans les sketches de latence")
+        return len(old)
+
+    def compacted_key_usage(self):
+        """Compteurs par clé des enregistrements compactés : {label: agrégat}"""
+        try:
+            with open(self.data_file, "r") as f:
+                return json.load(f)["database"].get("key_usage", {})
+        except Exception as e:
+            print(f"Erreur lecture des compteurs par clé: {e}")
+            return {}
+
+    def _ring_for(self, window):
+        for ring in self.rings:
+            if ring.span >= window:
+                return ring
+        return self.rings[-1]
+
+    def _buckets(self, window, until):
+        """Cases de la fenêtre : agrégats locaux puis ceux des autres processus"""
+        ring = self._ring_for(window)
+        with self.lock:
+            buckets = [(start, dict(bucket)) for start, bucket in ring.buckets(until - window, until)]
+        for other in self._published_rings(ring.resolution):
+            buckets.extend(other.buckets(until - window, until))
+        return buckets
+
+    def window_stats(self, window, until=None):
+        """
+        Agrégats des `window` dernières secondes
+
+        Returns:
+            dict: {operation_type: {algorithm: {count, avg, min, max}}}
+        """
+        until = until or time.time()
+        totals = {}
+        for _, bucket in self._buckets(window, until):
+            for key, (count, total, minimum, maximum) in bucket.items():
+                stats = totals.get(key)
+                if stats is None:
+                    totals[key] = [count, total, minimum, maximum]
+                else:
+                    stats[0] += count
+                    stats[1] += total
+                    stats[2] = min(stats[2], minimum)
+                    stats[3] = max(stats[3], maximum)
+
+        result = {}
+        for (operation_type, algorithm), (count, total, minimum, maximum) in totals.items():
+            result.setdefault(operation_type, {})[algorithm] = {
+                'count': count,
+                'avg': total / count,
+                'min': minimum,
+                'max': maximum,
+            }
+        return result
+
+    def timeline(self, window, operation_type=None, until=None):
+        """
+        Série temporelle (une entrée par case) des `window` dernières secondes
+
+        Returns:
+            list: [{'start': début de case, 'count': n, 'avg': durée moyenne}, ...]
+        """
+        until = until or time.time()
+        points = {}
+        for start, bucket in self._buckets(window, until):
+            point = points.setdefault(start, [0, 0.0])
+            for (op, _), stats in bucket.items():
+                if operation_type is None or op == operation_type:
+                    point[0] += stats[0]
+                    point[1] += stats[1]
+        return [
+            {'start': start, 'count': count, 'avg': total / count}
+            for start, (count, total) in sorted(points.items())
+            if count
+        ]
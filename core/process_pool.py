@@ -0,0 +1,65 @@
+"""
+Pool de processus de calcul partagé (vérification de signatures par lot,
+recherche de collisions)
+
+Démarrer un ProcessPoolExecutor (méthode spawn) à chaque requête coûte un
+interpréteur par processus et l'import de tous les modules de calcul. Le pool
+est créé au premier usage puis réutilisé ; chaque appel borne seulement le
+nombre de tâches qu'il garde en vol.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.singleton_metaclass import SingletonMeta
+
+
+class ProcessPool(metaclass=SingletonMeta):
+    """
+    Configuration (.env) :
+        compute_workers   nombre de processus du pool (défaut : nombre de cœurs)
+    """
+
+    def __init__(self):
+        cpu_count = os.cpu_count() or 1
+        self.max_workers = max(1, int(os.environ.get("compute_workers", cpu_count)))
+        self.lock = threading.Lock()
+        self._executor = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """Les processus du pool appartiennent au parent : le fils crée le sien"""
+        self.lock = threading.Lock()
+        self._executor = None
+
+    def clamp(self, workers):
+        """Parallélisme demandé (éventuellement par un client), borné par la taille du pool"""
+        if not workers or int(workers) < 1:
+            return self.max_workers
+        return min(int(workers), self.max_workers)
+
+    def _get_executor(self):
+        with self.lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def submit(self, function, *args):
+        """Soumet une tâche ; un pool cassé (processus tué) est recréé une fois"""
+        executor = self._get_executor()
+        try:
+            return executor.submit(function, *args)
+        except BrokenProcessPool:
+            with self.lock:
+                if self._executor is executor:
+                    self._executor = None
+            return self._get_executor().submit(function, *args)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+Configuration gunicorn (déploiement multi-processus)
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Chaque worker ouvre sa propre session PKCS#11 après le fork et écrit ses
+mesures dans son propre fragment (`metrics_shard_dir`) : aucun worker ne
+réécrit data.json à chaque requête. Les fragments sont fusionnés par la page
+d'analyse et lors de la compaction.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("bind", "127.0.0.1:5000")
+workers = int(os.environ.get("workers", min(4, multiprocessing.cpu_count())))
+# Application chargée dans chaque worker : rien de PKCS#11 n'est hérité du maître
+preload_app = False
+timeout = 120
+
+os.environ.setdefault("metrics_shard_dir", "metrics_shards")
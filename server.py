@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 
 from config import Config
-from controller import blueprints
 
 config = Config(".env")
 config.load_env()
@@ -12,12 +11,20 @@ print("hello")
 from flask import Flask
 
 def create_app():
+    from controller import blueprints
+    from core.key_pool_manager import KeyPoolManager
+
     application = Flask(__name__)
     for blueprint in blueprints:
         application.register_blueprint(blueprint)
+    KeyPoolManager().start()
     return application
 
-app = create_app()
+# Les processus de calcul (multiprocessing, méthode spawn) réexécutent ce module
+# sous le nom __mp_main__ : ils ne doivent ni instancier les contrôleurs ni
+# ouvrir de session HSM ni démarrer le pool de clés
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -276,6 +276,12 @@ function displayPerformanceResults(result) {
                         html += `<div style="color: ${demo.changed ? '#10b981' : '#ef4444'}">`;
                         html += `Hash changé: ${demo.changed ? 'OUI ✓' : 'NON ✗'}</div>`;
                     }
+                    if (demo.collision) {
+                        html += `<div class="code-block">${demo.collision.message_a} → ${demo.collision.digest_a}<br>`;
+                        html += `${demo.collision.message_b} → ${demo.collision.digest_b}</div>`;
+                        html += `<div>Préfixe commun: <strong>${demo.collision.truncated}</strong> · `;
+                        html += `${Math.round(demo.search.candidates_per_s)} essais/s</div>`;
+                    }
                     html += `</div>`;
                 });
                 
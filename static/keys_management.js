@@ -361,6 +361,8 @@ function getOperationTypeBadge(type) {
         'signature': { class: 'bg-success', text: 'Signature' },
         'encryption': { class: 'bg-warning', text: 'Chiffrement' },
         'decryption': { class: 'bg-info', text: 'Déchiffrement' },
+        'verification': { class: 'bg-success', text: 'Vérification' },
+        'batch_verification': { class: 'bg-success', text: 'Vérification par lot' },
         'hash_and_sign': { class: 'bg-dark', text: 'Hachage+Sign' }
     };
 
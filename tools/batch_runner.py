@@ -0,0 +1,235 @@
+"""
+Traitements par lot hors ligne, directement sur HashManager et HSMManager
+
+    hash     hache tous les fichiers d'une arborescence
+    sign     hache puis signe (clé du HSM) tous les fichiers d'une arborescence
+    decrypt  déchiffre un fichier JSONL {"id", "ciphertext", "key_label"?} par ligne
+
+Exemples :
+    python -m tools.batch_runner hash ./documents -o hashes.jsonl --algorithm sha256
+    python -m tools.batch_runner sign ./documents -o signatures.jsonl --key-label ma_cle --workers 4
+    python -m tools.batch_runner decrypt messages.jsonl -o clairs.jsonl --key-label ma_cle --resume
+
+Les entrées sont lues au fil de l'eau et réparties sur `--workers` processus ;
+chaque processus ouvre sa propre session PKCS#11. Les résultats sont écrits
+une ligne JSON par élément dès qu'ils arrivent : avec `--resume`, les éléments
+déjà traités avec succès sont ignorés. Les mesures des workers sont écrites
+dans des fragments (metrics_shard_dir) puis fusionnées à la fin.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from config import Config
+
+# État de chaque processus de travail (gestionnaires initialisés une fois)
+_WORKER = {}
+
+
+def _init_worker(mode):
+    from core.hash_manager import HashManager
+    _WORKER['hash_manager'] = HashManager()
+    if mode in ('sign', 'decrypt'):
+        from core.hsm_manager import HSMManager
+        hsm_manager = HSMManager()
+        # Session propre à ce processus
+        if hsm_manager.connect() is None:
+            raise RuntimeError("Connexion au HSM impossible")
+        _WORKER['hsm_manager'] = hsm_manager
+
+
+def _process_item(mode, item, options):
+    start_time = time.perf_counter()
+    result = {'id': item['id']}
+    try:
+        if mode in ('hash', 'sign'):
+            digest = _WORKER['hash_manager'].compute_file_hash(item['path'], options['algorithm'])
+            result.update(path=item['path'], size=item['size'], algorithm=options['algorithm'], digest=digest)
+            if mode == 'sign':
+                # Même convention que HSMManager.hash_and_sign : on signe le condensat hexadécimal
+                signature = _WORKER['hsm_manager'].sign_data(digest, options['key_label'])
+                if signature is None:
+                    raise RuntimeError("Échec de la signature")
+                result.update(key_label=options['key_label'], signature=signature)
+        else:
+            key_label = item.get('key_label') or options['key_label']
+            plaintext = _WORKER['hsm_manager'].decrypt_data(item['ciphertext'], label_key=key_label)
+            if plaintext is None:
+                raise RuntimeError("Échec du déchiffrement")
+            result.update(key_label=key_label, plaintext=plaintext)
+        result['status'] = 'ok'
+    except Exception as e:
+        result.update(status='error', error=str(e))
+    result['duration'] = time.perf_counter() - start_time
+    return result
+
+
+def process_batch(mode, items, options):
+    """Tâche d'un processus : traite un lot d'éléments"""
+    results = [_process_item(mode, item, options) for item in items]
+    if 'hsm_manager' in _WORKER:
+        # Les processus du pool se terminent sans atexit : index par clé publié à chaque lot
+        _WORKER['hsm_manager'].key_usage.flush()
+    return results
+
+
+def iter_files(root):
+    """Fichiers de l'arborescence, dans un ordre stable"""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                yield {'id': os.path.relpath(path, root), 'path': path, 'size': os.path.getsize(path)}
+
+
+def iter_ciphertexts(path):
+    """Lignes du fichier JSONL ; l'identifiant par défaut est le numéro de ligne"""
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield {
+                'id': str(record.get('id', line_number)),
+                'ciphertext': record.get('ciphertext') or record.get('data'),
+                'key_label': record.get('key_label'),
+            }
+
+
+def load_completed(output):
+    """
+    Identifiants déjà traités avec succès dans le fichier de sortie
+
+    Une dernière ligne incomplète (interruption pendant l'écriture) est retirée.
+    """
+    completed = set()
+    if not os.path.exists(output):
+        return completed
+    valid_end = 0
+    with open(output, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_end += len(line)
+            if record.get('status') == 'ok':
+                completed.add(record['id'])
+    with open(output, 'r+b') as f:
+        f.truncate(valid_end)
+    return completed
+
+
+def _batches(items, batch_size, skip, counters):
+    batch = []
+    for item in items:
+        if item['id'] in skip:
+            counters['skipped'] += 1
+            continue
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run(args):
+    options = {'algorithm': args.algorithm, 'key_label': args.key_label}
+    items = iter_ciphertexts(args.input) if args.mode == 'decrypt' else iter_files(args.input)
+    skip = load_completed(args.output) if args.resume else set()
+    counters = {'ok': 0, 'errors': 0, 'skipped': 0, 'bytes': 0}
+
+    start_time = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(args.mode,))
+    in_flight = set()
+    interrupted = False
+    try:
+        with open(args.output, 'a' if args.resume else 'w') as out:
+            batches = _batches(items, args.batch_size, skip, counters)
+            exhausted = False
+            while not exhausted or in_flight:
+                # Nombre borné de lots en vol : les entrées sont lues au fil de l'eau
+                while not exhausted and len(in_flight) < 2 * args.workers:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    in_flight.add(executor.submit(process_batch, args.mode, batch, options))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        out.write(json.dumps(result) + '\n')
+                        if result['status'] == 'ok':
+                            counters['ok'] += 1
+                            counters['bytes'] += result.get('size', 0)
+                        else:
+                            counters['errors'] += 1
+                            print(f"Erreur {result['id']}: {result['error']}", file=sys.stderr)
+                out.flush()
+    except KeyboardInterrupt:
+        interrupted = True
+        print("Interrompu : relancer avec --resume pour reprendre", file=sys.stderr)
+    finally:
+        executor.shutdown(wait=not interrupted, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start_time
+    return dict(counters, elapsed_s=elapsed, interrupted=interrupted)
+
+
+def print_summary(summary, mode):
+    elapsed = summary['elapsed_s']
+    processed = summary['ok'] + summary['errors']
+    print(f"{mode} : {summary['ok']} réussis, {summary['errors']} erreurs, "
+          f"{summary['skipped']} déjà traités, en {elapsed:.2f} s")
+    if elapsed > 0:
+        line = f"Débit : {processed / elapsed:.1f} éléments/s"
+        if summary['bytes']:
+            line += f", {summary['bytes'] / elapsed / (1024 * 1024):.2f} Mo/s"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Traitements par lot : hachage, signature, déchiffrement")
+    parser.add_argument('mode', choices=['hash', 'sign', 'decrypt'])
+    parser.add_argument('input', help="Répertoire (hash, sign) ou fichier JSONL (decrypt)")
+    parser.add_argument('-o', '--output', required=True, help="Fichier JSONL des résultats")
+    parser.add_argument('--algorithm', default='sha256', help="Algorithme de hachage (hash, sign)")
+    parser.add_argument('--key-label', help="Label de la clé (sign, et decrypt si absent des lignes)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=16, help="Éléments par tâche envoyée à un processus")
+    parser.add_argument('--resume', action='store_true', help="Ignore les éléments déjà traités avec succès")
+    parser.add_argument('--env', default='.env')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'sign' and not args.key_label:
+        parser.error("--key-label est requis pour sign")
+
+    Config(args.env).load_env()
+    if args.mode == 'sign':
+        from core.hash_backends import HashBackendRegistry
+        if not HashBackendRegistry().is_secure(args.algorithm):
+            parser.error(f"{args.algorithm} n'est pas utilisable pour une signature")
+    # Les workers écrivent leurs mesures dans des fragments, sans se disputer data.json
+    os.environ.setdefault("metrics_shard_dir", "metrics_shards")
+
+    summary = run(args)
+    print_summary(summary, args.mode)
+
+    from core.metrics_manager import MetricsManager
+    MetricsManager().merge_shards()
+    return 130 if summary['interrupted'] else (1 if summary['errors'] else 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Export en ligne de commande de l'historique des performances
+
+Exemples :
+    python -m tools.export_performances --format csv --operation-type hash > hash.csv
+    python -m tools.export_performances --format parquet --since 2025-01-01 -o perf.parquet
+"""
+import argparse
+import sys
+
+from config import Config
+from core.export_manager import ExportManager, parse_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export de l'historique des performances")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('-o', '--output', help="Fichier de sortie (défaut : sortie standard)")
+    parser.add_argument('--operation-type', help="ex: hash, sign_data, encrypt_data")
+    parser.add_argument('--algorithm')
+    parser.add_argument('--key-label')
+    parser.add_argument('--since', help="Timestamp ou date ISO 8601")
+    parser.add_argument('--until', help="Timestamp ou date ISO 8601")
+    parser.add_argument('--data-file', help="Fichier de données (défaut : data_file du .env)")
+    parser.add_argument('--env', default='.env')
+    args = parser.parse_args(argv)
+
+    if not args.data_file:
+        Config(args.env).load_env()
+
+    chunks = ExportManager(args.data_file).stream(
+        args.format,
+        operation_type=args.operation_type,
+        algorithm=args.algorithm,
+        key_label=args.key_label,
+        since=parse_time(args.since),
+        until=parse_time(args.until),
+    )
+
+    if args.output:
+        mode = 'wb' if args.format == 'parquet' else 'w'
+        with open(args.output, mode) as out:
+            for chunk in chunks:
+                out.write(chunk)
+    elif args.format == 'parquet':
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+    else:
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+
+
+if __name__ == '__main__':
+    main()
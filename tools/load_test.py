@@ -0,0 +1,310 @@
+"""
+Générateur de charge pour l'application Flask (routes réelles, token SoftHSM2 local)
+
+Le serveur doit tourner (python server.py). Deux modèles d'arrivée :
+    closed : `--concurrency` clients enchaînent les requêtes sans pause
+    open   : arrivées de Poisson à `--rate` req/s ; la latence est mesurée depuis
+             l'instant d'arrivée prévu (le temps d'attente est compté)
+
+Exemples :
+    python -m tools.load_test --mode closed --concurrency 8 --duration 30 --save-baseline baseline.json
+    python -m tools.load_test --mode open --rate 200 --duration 30 --baseline baseline.json --threshold 0.15
+
+Débit et latences ne comptent que les requêtes réussies : un serveur qui
+échoue vite (connexions refusées, 429, 500) ne paraît pas plus rapide. Les
+routes de formulaire répondent 200 même en échec : la réussite est lue dans
+la page de résultat (ou le champ `success` des réponses JSON).
+
+Avec `--seed`, la suite des requêtes (route, charge utile) est tirée avant le
+test et consommée dans l'ordre par les clients : deux exécutions envoient les
+mêmes requêtes, quel que soit l'entrelacement des threads.
+
+Avec `--baseline`, le code de sortie vaut 1 si le p99 ou le débit d'une route
+régresse au-delà du seuil, ou si son taux d'erreur augmente de plus de
+`--error-threshold`.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from core.latency_sketch import LatencySketch
+
+ROUTES = ['/sign-verify', '/encrypt-decrypt', '/hash', '/hash-sign', '/api/keys/list']
+
+# Requêtes tirées avant le test, rejouées en boucle
+PLAN_SIZE = 1024
+
+# Dict d'erreur affiché tel quel par une page de résultat (ex: hash_and_sign)
+_ERROR_IN_PAGE = re.compile(r"(?:'|&#39;)success(?:'|&#39;): False")
+
+
+def parse_payload_mix(raw_mix):
+    """'64:0.5,1024:0.3,8192:0.2' -> ([64, 1024, 8192], [0.5, 0.3, 0.2])"""
+    sizes, weights = [], []
+    for item in raw_mix.split(','):
+        size, _, weight = item.partition(':')
+        sizes.append(int(size))
+        weights.append(float(weight or 1))
+    return sizes, weights
+
+
+def response_succeeded(status, content_type, body):
+    """
+    Réussite d'une requête : les routes de formulaire rendent une page 200
+    même en échec (« Aucun résultat », cadre de résultat vide ou dict d'erreur)
+    """
+    if status >= 400:
+        return False
+    text = body.decode('utf-8', errors='replace')
+    if 'json' in content_type:
+        try:
+            return json.loads(text).get('success', True) is not False
+        except (ValueError, AttributeError):
+            return False
+    return 'class="data-display"' in text and 'Aucun résultat' not in text \
+        and not _ERROR_IN_PAGE.search(text)
+
+
+class RouteStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = LatencySketch()  # requêtes réussies uniquement
+        self.requests = 0
+        self.errors = 0
+
+    def add(self, duration, success):
+        with self.lock:
+            self.requests += 1
+            if success:
+                self.latency.add(duration)
+            else:
+                self.errors += 1
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.url = args.url.rstrip('/')
+        self.routes = args.routes.split(',')
+        self.sizes, self.weights = parse_payload_mix(args.payload_mix)
+        self.hash_algorithm = args.hash_algorithm
+        self.timeout = args.timeout
+        self.private_key = args.private_key
+        self.public_key = args.public_key
+        self.stats = {route: RouteStats() for route in self.routes}
+        # Utilisé seulement par le thread principal (plan, arrivées du mode open)
+        self.random = random.Random(args.seed)
+        self.plan = [self._plan_entry() for _ in range(PLAN_SIZE)]
+        self._plan_lock = threading.Lock()
+        self._plan_index = 0
+
+    def discover_keys(self):
+        """Utilise la première clé RSA listée par le serveur si aucun label n'est fourni"""
+        if self.private_key and self.public_key:
+            return
+        with urllib.request.urlopen(f"{self.url}/api/keys/list", timeout=self.timeout) as response:
+            keys = json.load(response).get('keys', [])
+        # Chiffrement et signature « simple » des formulaires : clés RSA
+        keys = [key for key in keys if key.get('key_type') == 'RSA']
+        if not keys:
+            raise SystemExit("Aucune clé RSA dans le HSM : générez-en une ou passez --private-key/--public-key")
+        self.private_key = self.private_key or keys[0]['label']
+        self.public_key = self.public_key or keys[0]['label']
+
+    def _plan_entry(self):
+        route = self.random.choice(self.routes)
+        size = self.random.choices(self.sizes, self.weights)[0]
+        return route, ''.join(self.random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=size))
+
+    def next_request(self):
+        """Requête suivante du plan (route, charge utile), dans l'ordre de tirage"""
+        with self._plan_lock:
+            entry = self.plan[self._plan_index % len(self.plan)]
+            self._plan_index += 1
+        return entry
+
+    def _request(self, route, payload):
+        """Construit la requête telle que l'envoient les formulaires de l'interface"""
+        if route == '/api/keys/list':
+            return urllib.request.Request(f"{self.url}{route}")
+        forms = {
+            '/sign-verify': {'mode': 'signer', 'keyPrivateSelector': self.private_key, 'simpleInput': payload},
+            '/encrypt-decrypt': {'mode': 'encrypt', 'keyPublicSelector': self.public_key, 'simpleInput': payload},
+            '/hash': {'methodHash': self.hash_algorithm, 'hashInput': payload},
+            '/hash-sign': {'hashAlgorithm': self.hash_algorithm, 'keyPrivateSelector': self.private_key,
+                           'hashSignInput': payload},
+        }
+        data = urllib.parse.urlencode(forms[route]).encode('utf-8')
+        return urllib.request.Request(f"{self.url}{route}", data=data, method='POST')
+
+    def execute(self, route, payload, scheduled_at=None):
+        request = self._request(route, payload)
+        start_time = scheduled_at if scheduled_at is not None else time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                success = response_succeeded(response.status, response.headers.get('Content-Type', ''),
+                                             response.read())
+        except (urllib.error.URLError, OSError):
+            success = False
+        self.stats[route].add(time.perf_counter() - start_time, success)
+
+    def run_closed(self, concurrency, duration):
+        deadline = time.perf_counter() + duration
+
+        def client():
+            while time.perf_counter() < deadline:
+                self.execute(*self.next_request())
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open(self, rate, duration, concurrency):
+        start = time.perf_counter()
+        next_arrival = start
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while next_arrival < start + duration:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.execute, *self.next_request(), next_arrival)
+                next_arrival += self.random.expovariate(rate)
+
+    def report(self, elapsed):
+        routes = {}
+        for route, stats in self.stats.items():
+            sketch = stats.latency
+            if stats.requests == 0:
+                continue
+            succeeded = sketch.count > 0
+            routes[route] = {
+                'count': stats.requests,
+                'ok': sketch.count,
+                'errors': stats.errors,
+                'error_rate': stats.errors / stats.requests,
+                'ops_per_s': sketch.count / elapsed,
+                'mean_ms': sketch.mean * 1000 if succeeded else None,
+                'p50_ms': sketch.quantile(0.5) * 1000 if succeeded else None,
+                'p90_ms': sketch.quantile(0.9) * 1000 if succeeded else None,
+                'p99_ms': sketch.quantile(0.99) * 1000 if succeeded else None,
+                'max_ms': sketch.max * 1000 if succeeded else None,
+                'histogram': sketch.to_dict(),
+            }
+        total = sum(route['count'] for route in routes.values())
+        ok = sum(route['ok'] for route in routes.values())
+        return {
+            'timestamp': time.time(),
+            'elapsed_s': elapsed,
+            'total_requests': total,
+            'total_errors': total - ok,
+            'total_ops_per_s': ok / elapsed if elapsed else 0,
+            'routes': routes,
+        }
+
+
+def _error_rate(stats):
+    # Références enregistrées avant l'ajout de error_rate
+    if 'error_rate' in stats:
+        return stats['error_rate']
+    return stats['errors'] / stats['count'] if stats['count'] else 0.0
+
+
+def compare_to_baseline(result, baseline, threshold, error_threshold=0.01):
+    """
+    Liste des régressions : p99 ou débit au-delà du seuil relatif, taux
+    d'erreur supérieur à celui de la référence de plus de `error_threshold`
+    """
+    regressions = []
+    for route, reference in baseline['routes'].items():
+        current = result['routes'].get(route)
+        if current is None:
+            continue
+        current_error_rate = _error_rate(current)
+        reference_error_rate = _error_rate(reference)
+        if current_error_rate > reference_error_rate + error_threshold:
+            regressions.append(f"{route}: taux d'erreur {current_error_rate:.1%} > référence "
+                               f"{reference_error_rate:.1%}")
+        if current['p99_ms'] is not None and reference['p99_ms'] is not None \
+                and current['p99_ms'] > reference['p99_ms'] * (1 + threshold):
+            regressions.append(f"{route}: p99 {current['p99_ms']:.2f} ms > référence {reference['p99_ms']:.2f} ms")
+        if current['ops_per_s'] < reference['ops_per_s'] * (1 - threshold):
+            regressions.append(f"{route}: débit {current['ops_per_s']:.1f} op/s < référence "
+                               f"{reference['ops_per_s']:.1f} op/s")
+    return regressions
+
+
+def print_report(result):
+    print(f"{'Route':<20}{'Nombre':>8}{'Erreurs':>9}{'op/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for route, stats in result['routes'].items():
+        latencies = ''.join(f"{stats[name]:>10.2f}" if stats[name] is not None else f"{'-':>10}"
+                            for name in ('p50_ms', 'p90_ms', 'p99_ms'))
+        print(f"{route:<20}{stats['count']:>8}{stats['errors']:>9}{stats['ops_per_s']:>10.1f}{latencies}")
+    print(f"Total : {result['total_requests']} requêtes ({result['total_errors']} erreurs), "
+          f"{result['total_ops_per_s']:.1f} op/s réussies en {result['elapsed_s']:.1f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge de HSM Crypto Manager")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--routes', default=','.join(ROUTES), help="Routes ciblées, séparées par des virgules")
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--concurrency', type=int, default=4, help="Clients (closed) ou requêtes en vol max (open)")
+    parser.add_argument('--rate', type=float, default=50, help="Arrivées par seconde (mode open)")
+    parser.add_argument('--duration', type=float, default=30, help="Durée du test en secondes")
+    parser.add_argument('--payload-mix', default='64:0.5,1024:0.3,8192:0.2', help="taille:poids,...")
+    parser.add_argument('--hash-algorithm', default='sha256')
+    parser.add_argument('--private-key', help="Label de la clé privée (défaut : première clé RSA)")
+    parser.add_argument('--public-key', help="Label de la clé publique (défaut : première clé RSA)")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--save-baseline', help="Enregistre le résultat comme référence")
+    parser.add_argument('--baseline', help="Référence à comparer")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Régression tolérée (0.10 = 10 %%)")
+    parser.add_argument('--error-threshold', type=float, default=0.01,
+                        help="Hausse tolérée du taux d'erreur (0.01 = 1 point)")
+    args = parser.parse_args(argv)
+
+    load_test = LoadTest(args)
+    if any(route in load_test.routes for route in ('/sign-verify', '/encrypt-decrypt', '/hash-sign')):
+        load_test.discover_keys()
+
+    start = time.perf_counter()
+    if args.mode == 'closed':
+        load_test.run_closed(args.concurrency, args.duration)
+    else:
+        load_test.run_open(args.rate, args.duration, args.concurrency)
+    result = load_test.report(time.perf_counter() - start)
+    result['config'] = {key: value for key, value in vars(args).items() if key not in ('baseline', 'save_baseline')}
+
+    print_report(result)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=4)
+        print(f"Référence enregistrée dans {os.path.abspath(args.save_baseline)}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(result, baseline, args.threshold, args.error_threshold)
+        if regressions:
+            print("RÉGRESSIONS :")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("Aucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())